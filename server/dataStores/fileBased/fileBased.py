@@ -1,10 +1,255 @@
 """File-based data store for IFC components"""
 
 import os
-import json
+import mmap
 import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import msgspec
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows: stores are only serialized within one process
+    fcntl = None
+
+# Each model directory holds one packed shard of MessagePack records plus an
+# index mapping "entityGuid_componentGuid" -> [byte offset, byte length,
+# componentGuid, entityGuid, entityType, componentType]. The trailing fields
+# let the memory tree build its indexes without decoding the records; indexes
+# written before they were added hold only the offset and length.
+COMPONENTS_FILE = 'components.msgpack'
+INDEX_FILE = 'index.json'
+
+# Shards written before the MessagePack encoding (one JSON component per line)
+JSONL_COMPONENTS_FILE = 'components.jsonl'
+
+# MessagePack codec, created once and reused for every record. Components are
+# decoded as plain dicts: their attributes differ per component type, so there
+# is no fixed schema to decode them into.
+_ENCODER = msgspec.msgpack.Encoder(enc_hook=str)
+_DECODER = msgspec.msgpack.Decoder()
+
+# Number of serialized components handed to the writer thread at a time
+WRITE_BATCH_SIZE = 1024
+
+# Shards smaller than this are read() rather than memory-mapped
+MMAP_MIN_BYTES = 64 * 1024
+
+# Threads reading files of the legacy one-file-per-component layout
+LEGACY_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# File in the store directory locked while a model's files are swapped or
+# deleted, so concurrent stores from several server processes do not interleave
+STORE_LOCK_FILE = '.store.lock'
+
+# Directory in the store that shards are written to before being moved into
+# their model directory; hidden names are not listed as models
+STAGING_DIR = '.staging'
+
+# File in the store directory counting its writes: {"generation": n, "models":
+# {model name: generation of its last store}}. Servers compare these counters
+# to notice changes; mtimes can miss a second write within one timestamp tick.
+GENERATION_FILE = '.generation.json'
+
+
+def read_generations(base_path):
+    """Read the write counters of a store directory
+
+    The file is replaced atomically, so this needs no lock.
+
+    Args:
+        base_path: Path of the store directory
+
+    Returns:
+        Tuple of (store generation, {model name: generation of its last store});
+        (0, {}) for a store nothing has been written to yet
+    """
+    try:
+        with open(os.path.join(base_path, GENERATION_FILE), 'rb') as f:
+            generations = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return 0, {}
+    return generations['generation'], generations['models']
+
+
+def _read_index(dir_path):
+    """Load the shard index of a model directory, or None for the legacy layout"""
+    index_path = os.path.join(dir_path, INDEX_FILE)
+    if not os.path.isfile(index_path):
+        return None
+    with open(index_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def read_components(dir_path):
+    """Read all components stored in a model directory
+
+    Reads the packed shard through mmap, slicing each component by its indexed
+    offset. JSON-lines shards and directories written before the shard layout
+    (one JSON file per component) are still read.
+
+    Args:
+        dir_path: Path of the model directory
+
+    Returns:
+        List of component dictionaries
+    """
+    shard = _open_shard(dir_path)
+    if shard is None:
+        return _read_legacy_components(dir_path)
+
+    index, f, decode = shard
+    if f is None:
+        return []
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return []
+
+        # Small shards are cheaper to read in one go than to map and fault in
+        if size < MMAP_MIN_BYTES:
+            return _decode_records(memoryview(f.read()), index, decode)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Ask the kernel to read the whole shard ahead in large requests
+            # rather than faulting it in page by page (Linux/BSD only)
+            if hasattr(mmap, 'MADV_WILLNEED'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+                mm.madvise(mmap.MADV_WILLNEED)
+            return _decode_records(mm, index, decode)
+
+
+def read_shard(dir_path):
+    """Read a model's packed shard without decoding its records
+
+    Args:
+        dir_path: Path of the model directory
+
+    Returns:
+        Tuple of (buffer, index, decode) - the shard contents as a memoryview,
+        the shard index and the function decoding one record slice - or None
+        for directories in the legacy one-file-per-component layout
+    """
+    shard = _open_shard(dir_path)
+    if shard is None:
+        return None
+
+    index, f, decode = shard
+    if f is None:
+        return memoryview(b''), index, decode
+    with f:
+        return memoryview(f.read()), index, decode
+
+
+def _open_shard(dir_path):
+    """Read a model's index and open its shard as one matching pair
+
+    Stores replace the shard and then the index while holding the store lock
+    exclusively (see FileBasedStore._swap_lock); both are opened here under a
+    shared lock, so a concurrent store cannot pair an old index with a new
+    shard. The open file keeps its contents readable after the lock is released.
+
+    Returns:
+        Tuple of (index, shard file or None for an empty index, decode), or
+        None for directories in the legacy one-file-per-component layout
+    """
+    with _shared_store_lock(os.path.dirname(os.path.abspath(dir_path))):
+        index = _read_index(dir_path)
+        if index is None:
+            return None
+        shard_path, decode = _shard_path(dir_path)
+        if not index:
+            return index, None, decode
+        return index, open(shard_path, 'rb'), decode
+
+
+@contextmanager
+def _shared_store_lock(base_path):
+    """Hold the store lock shared, excluding swaps but not other readers"""
+    lock_file = None
+    if fcntl is not None:
+        try:
+            lock_file = open(os.path.join(base_path, STORE_LOCK_FILE), 'rb')
+        except OSError:
+            # Store without a lock file: nothing has been stored with one
+            pass
+    if lock_file is None:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        yield
+
+
+def _shard_path(dir_path):
+    """Path of a model directory's shard and the decoder for its records"""
+    shard_path = os.path.join(dir_path, COMPONENTS_FILE)
+    if os.path.isfile(shard_path):
+        return shard_path, _DECODER.decode
+    return os.path.join(dir_path, JSONL_COMPONENTS_FILE), orjson.loads
+
+
+def _decode_records(buf, index, decode):
+    """Decode every indexed record of a shard held in a bytes-like buffer"""
+    components = []
+    for key, (offset, length, *_) in index.items():
+        try:
+            components.append(decode(buf[offset:offset + length]))
+        except Exception as e:
+            print(f"Error reading component {key}: {e}")
+    return components
+
+
+def _read_legacy_components(dir_path):
+    """Read a model directory stored as one JSON file per component
+
+    Files are read on a thread pool (read() releases the GIL, hiding the
+    per-file open/read latency) and parsed on the calling thread as they arrive.
+    """
+    components = []
+
+    # Read in inode order: files created together are laid out together on
+    # most filesystems, so this turns scattered reads into near-sequential ones
+    with os.scandir(dir_path) as entries:
+        files = [entry for entry in entries if entry.name.endswith('.json') and entry.is_file()]
+    files.sort(key=lambda entry: entry.inode())
+    paths = [entry.path for entry in files]
+
+    with ThreadPoolExecutor(max_workers=LEGACY_READ_WORKERS) as reader:
+        for path, data in zip(paths, reader.map(_read_file, paths)):
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                components.append(orjson.loads(data))
+            except Exception as e:
+                print(f"Error reading component {os.path.basename(path)}: {e}")
+
+    return components
+
+
+def _read_file(path):
+    """Return the contents of a file, or the error raised while reading it"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        return e
+
+
+def _temp_file(dir_path):
+    """Create a uniquely named, world-readable temporary file in dir_path and return its path"""
+    fd, path = tempfile.mkstemp(dir=dir_path, suffix='.tmp')
+    if hasattr(os, 'fchmod'):
+        os.fchmod(fd, 0o644)
+    os.close(fd)
+    return path
+
+
 class FileBasedStore:
     """Store components in a file-based directory structure"""
     
@@ -23,7 +268,28 @@ class FileBasedStore:
             )
         
         self.base_path = base_path
-        os.makedirs(self.base_path, exist_ok=True)
+        self._staging_path = os.path.join(base_path, STAGING_DIR)
+        os.makedirs(self._staging_path, exist_ok=True)
+        # Created up front so readers always find it (see _open_shard)
+        open(os.path.join(base_path, STORE_LOCK_FILE), 'a').close()
+        
+        # Serializes swaps within this process; _swap_lock adds a file lock
+        # for other processes sharing the store
+        self._swap_thread_lock = threading.Lock()
+    
+    @contextmanager
+    def _swap_lock(self):
+        """Hold the store-wide lock taken while model files are replaced or deleted"""
+        with self._swap_thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.base_path, STORE_LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
     
     def store(self, filename, components):
         """Store components from a file
@@ -39,36 +305,117 @@ class FileBasedStore:
         dir_name = os.path.splitext(filename)[0]
         dir_path = os.path.join(self.base_path, dir_name)
         
-        # Create the directory
-        os.makedirs(dir_path, exist_ok=True)
-        
-        # Store each component as a separate file
+        # Write all components into a single packed shard of MessagePack
+        # records, which is smaller and faster to decode than JSON.
+        # Files are written under unique temporary names in the staging
+        # directory (several processes may store the same model) and moved
+        # into the model directory once complete, so readers never see a
+        # half-written shard and a failed conversion leaves no model behind.
+        shard_path = os.path.join(dir_path, COMPONENTS_FILE)
+        index_path = os.path.join(dir_path, INDEX_FILE)
+        shard_tmp = _temp_file(self._staging_path)
+        index_tmp = None
+        offsets = {}
         stored_count = 0
+        pos = 0
+        batch = []
+        pending = None
         
-        for component in components:
-            # Get entityGuid and guid from component
-            entity_guid = component.get('entityGuid', 'unknown')
-            componentGuid = component.get('componentGuid', 'unknown')
+        # Serialization holds the GIL but write() releases it, so a writer
+        # thread flushes one batch while the next one is being serialized.
+        # components may be a generator producing them as they are consumed.
+        try:
+            with open(shard_tmp, 'wb', buffering=1 << 20) as f, \
+                    ThreadPoolExecutor(max_workers=1) as writer:
+                for component in components:
+                    # Get entityGuid and guid from component
+                    entity_guid = component.get('entityGuid', 'unknown')
+                    componentGuid = component.get('componentGuid', 'unknown')
+                    key = f"{entity_guid}_{componentGuid}"
+                    
+                    try:
+                        record = _ENCODER.encode(component)
+                    except Exception as e:
+                        print(f"Error storing component {key}: {e}")
+                        continue
+                    
+                    batch.append(record)
+                    offsets[key] = (pos, len(record), component.get('componentGuid'), component.get('entityGuid'),
+                                    component.get('entityType'), component.get('componentType', 'Unknown'))
+                    pos += len(record)
+                    stored_count += 1
+                    
+                    if len(batch) >= WRITE_BATCH_SIZE:
+                        # Keep at most one batch in flight to bound memory
+                        if pending is not None:
+                            pending.result()
+                        pending = writer.submit(f.write, b"".join(batch))
+                        batch = []
+                
+                if pending is not None:
+                    pending.result()
+                f.write(b"".join(batch))
             
-            # Create filename: entityGuid_guid.json
-            component_filename = f"{entity_guid}_{componentGuid}.json"
-            component_path = os.path.join(dir_path, component_filename)
+            index_tmp = _temp_file(self._staging_path)
+            with open(index_tmp, 'wb') as f:
+                f.write(orjson.dumps(offsets))
+        except BaseException:
+            # Leave no partial shard behind if producing the components failed
+            for tmp in (shard_tmp, index_tmp):
+                if tmp is not None and os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+        
+        # Shard and index are swapped together so they always match
+        with self._swap_lock():
+            os.makedirs(dir_path, exist_ok=True)
+            os.replace(shard_tmp, shard_path)
+            os.replace(index_tmp, index_path)
             
-            # Write component to file
-            try:
-                with open(component_path, 'w') as f:
-                    json.dump(component, f, indent=2, default=str)
-                stored_count += 1
-            except Exception as e:
-                print(f"Error storing component {component_filename}: {e}")
+            # Drop files left over from an earlier store of this model in an older
+            # layout (a JSON-lines shard or one JSON file per component)
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.name == JSONL_COMPONENTS_FILE or (
+                            entry.name.endswith('.json') and entry.name != INDEX_FILE):
+                        os.remove(entry.path)
+            
+            previous_generation, generation = self._bump_generation(dir_name)
         
         return {
             'success': True,
             'count': stored_count,
             'path': dir_path,
-            'directory': dir_name
+            'directory': dir_name,
+            # Store generation just before and after the swap, so a caller can
+            # tell whether any other write happened since it last read the store
+            'previous_generation': previous_generation,
+            'generation': generation
         }
     
+    def generation(self):
+        """Current write counter of the store (see GENERATION_FILE)"""
+        return read_generations(self.base_path)[0]
+    
+    def _bump_generation(self, model_name, deleted=False):
+        """Count a write to a model (caller holds the swap lock)
+        
+        Returns:
+            Tuple of the store generation before and after the write
+        """
+        previous, models = read_generations(self.base_path)
+        generation = previous + 1
+        if deleted:
+            models.pop(model_name, None)
+        else:
+            models[model_name] = generation
+        
+        generation_tmp = _temp_file(self._staging_path)
+        with open(generation_tmp, 'wb') as f:
+            f.write(orjson.dumps({'generation': generation, 'models': models}))
+        os.replace(generation_tmp, os.path.join(self.base_path, GENERATION_FILE))
+        return previous, generation
+    
     def retrieve(self, directory):
         """Retrieve all components from a directory
         
@@ -83,19 +430,7 @@ class FileBasedStore:
         if not os.path.isdir(dir_path):
             return []
         
-        components = []
-        
-        for filename in os.listdir(dir_path):
-            if filename.endswith('.json'):
-                file_path = os.path.join(dir_path, filename)
-                try:
-                    with open(file_path, 'r') as f:
-                        component = json.load(f)
-                        components.append(component)
-                except Exception as e:
-                    print(f"Error reading component {filename}: {e}")
-        
-        return components
+        return read_components(dir_path)
     
     def list_directories(self):
         """List all stored directories
@@ -107,21 +442,29 @@ class FileBasedStore:
             return []
         
         directories = []
-        for item in os.listdir(self.base_path):
-            item_path = os.path.join(self.base_path, item)
-            if os.path.isdir(item_path):
-                # Count JSON files in directory
-                json_files = [f for f in os.listdir(item_path) if f.endswith('.json')]
+        # DirEntry caches the file type from the directory read, saving a
+        # stat() per entry over listdir() + isdir()
+        with os.scandir(self.base_path) as items:
+            for item in items:
+                if not item.is_dir() or item.name.startswith('.'):
+                    continue
+                # Count indexed components (or JSON files in the legacy layout)
+                index = _read_index(item.path)
+                if index is None:
+                    with os.scandir(item.path) as entries:
+                        component_count = sum(1 for e in entries if e.name.endswith('.json') and e.is_file())
+                else:
+                    component_count = len(index)
                 directories.append({
-                    'name': item,
-                    'component_count': len(json_files)
+                    'name': item.name,
+                    'component_count': component_count
                 })
         
         return directories
 
     def model_exists(self, model_name):
         """Check if a model directory exists."""
-        if not model_name or model_name in ('.', '..'):
+        if not model_name or model_name.startswith('.'):
             return False
         if os.path.sep in model_name or (os.path.altsep and os.path.altsep in model_name):
             return False
@@ -134,7 +477,7 @@ class FileBasedStore:
         Returns:
             True if deleted, False if not found
         """
-        if not model_name or model_name in ('.', '..'):
+        if not model_name or model_name.startswith('.'):
             return False
         if os.path.sep in model_name or (os.path.altsep and os.path.altsep in model_name):
             return False
@@ -146,8 +489,9 @@ class FileBasedStore:
         if base_path not in target_path.parents:
             raise ValueError("Invalid model path")
 
-        if not target_path.is_dir():
-            return False
-
-        shutil.rmtree(target_path)
+        with self._swap_lock():
+            if not target_path.is_dir():
+                return False
+            shutil.rmtree(target_path)
+            self._bump_generation(target_path.name, deleted=True)
         return True
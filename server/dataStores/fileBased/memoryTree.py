@@ -1,105 +1,377 @@
 """In-memory tree structure for component storage and querying (fileBased)"""
 
+import logging
 import os
-import json
+import sys
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from .fileBased import read_components, read_generations, read_shard
+except ImportError:
+    from fileBased import read_components, read_generations, read_shard
+
+log = logging.getLogger(__name__)
+
+# Distinct argument combinations remembered per cached query method
+QUERY_CACHE_SIZE = 512
+
+
+def _cache_key(values: Optional[List[str]], ordered: bool = False):
+    """Hashable form of an optional list argument
+
+    Order and duplicates are ignored unless ordered is set (for arguments whose
+    order shows in the result, such as the model order of grouped results).
+    """
+    if not values:
+        return None
+    return tuple(values) if ordered else tuple(sorted(set(values)))
+
+
+def _merge_sorted(parts: List[Tuple[str, ...]]) -> Tuple[str, ...]:
+    """Merge sorted GUID tuples into one sorted tuple without duplicates
+
+    Sorting the concatenation merges the presorted runs in linear time, and
+    dict.fromkeys drops the duplicates (GUIDs shared between models) in order.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    return tuple(dict.fromkeys(sorted(chain.from_iterable(parts))))
+
+
+def _model_stamp(generations: Dict[str, int], model_name: str, stat) -> tuple:
+    """Value that changes whenever a model directory is written
+
+    The store's generation counter catches every store, even several within
+    one timestamp tick on filesystems with coarse mtimes; the mtime catches
+    directories written by other means.
+    """
+    return generations.get(model_name), stat.st_mtime_ns
+
+
+class LazyComponents(dict):
+    """componentGuid -> component mapping that decodes records on first access
+
+    Values start out as (offset, length) spans into the model's shard and are
+    replaced by the decoded component the first time they are looked up, so a
+    refresh never decodes components that are not queried. Membership tests
+    and key iteration are plain dict operations; get, values, items, copy and
+    dict(...) return decoded components. Read-only once built.
+    """
+    
+    __slots__ = ('_buffer', '_decode')
+    
+    def __init__(self, buffer, decode):
+        super().__init__()
+        self._buffer = buffer
+        self._decode = decode
+    
+    def __getitem__(self, component_guid):
+        component = dict.__getitem__(self, component_guid)
+        if component.__class__ is tuple:
+            offset, length = component
+            component = self._decode(self._buffer[offset:offset + length])
+            dict.__setitem__(self, component_guid, component)
+        return component
+    
+    def __iter__(self):
+        # Overriding this makes dict(), dict.update() and {**...} copy through
+        # keys() and __getitem__ instead of the raw spans
+        return dict.__iter__(self)
+    
+    def get(self, component_guid, default=None):
+        if dict.__contains__(self, component_guid):
+            return self[component_guid]
+        return default
+    
+    def _decode_all(self):
+        """Decode every component still held as a span"""
+        for component_guid, component in dict.items(self):
+            if component.__class__ is tuple:
+                self[component_guid]
+    
+    def values(self):
+        self._decode_all()
+        return dict.values(self)
+    
+    def items(self):
+        self._decode_all()
+        return dict.items(self)
+    
+    def copy(self):
+        self._decode_all()
+        return dict(dict.items(self))
+
+
+class ModelIndex:
+    """Query indexes of one model
+
+    A __slots__ class rather than a dict: attribute access skips the key
+    hashing and each instance carries no per-instance __dict__.
+    """
+    
+    __slots__ = ('by_entity', 'by_type', 'by_entityType', 'entity_types', 'by_componentGuid',
+                 'entity_of_component', 'sorted_entity_guids', 'sorted_component_guids')
+    
+    def __init__(self, by_entity: Dict, by_type: Dict, by_entityType: Dict,
+                 entity_types: Dict, by_componentGuid: Dict, entity_of_component: Dict):
+        self.by_entity = by_entity                # entity_guid -> (componentGuids)
+        self.by_type = by_type                    # component_type -> frozenset(componentGuids)
+        self.by_entityType = by_entityType        # entity_type -> frozenset(entity_guids)
+        self.entity_types = entity_types          # entity_guid -> entity_type
+        self.by_componentGuid = by_componentGuid  # componentGuid -> component_data
+        self.entity_of_component = entity_of_component  # componentGuid -> entity_guid
+        
+        # Sorted once here so unfiltered queries return them without sorting
+        self.sorted_entity_guids = tuple(sorted(by_entity))
+        self.sorted_component_guids = tuple(sorted(by_componentGuid))
+
 
 class MemoryTree:
     """In-memory tree structure for fast component querying"""
     
     def __init__(self):
         """Initialize the memory tree"""
-        self.models: Dict = {}  # models[model_name] = {by_entity, by_type, by_entityType, by_componentGuid}
-
+        self.models: Dict[str, ModelIndex] = {}  # model_name -> ModelIndex
+        # model_name -> (store generation of its last store, directory st_mtime_ns)
+        # when it was loaded; see _model_stamp
+        self._stamps: Dict[str, tuple] = {}
+        
+        # Bumped whenever self.models is replaced; part of every cache key so a
+        # result computed from the previous tree can never be served again
+        self._version = 0
+        
+        # The results of these never change between refreshes; cached per instance
+        self._cached_models = lru_cache(maxsize=1)(self._models_for)
+        self._cached_entity_types = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._entity_types_for)
+        self._cached_component_types = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._component_types_for)
+        self._cached_component_guids_by_type = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._component_guids_by_type_for)
+        
+        # (version, query name, *argument keys) -> GUID query result
+        self._query_cache: Dict[tuple, object] = {}
+    
+    @property
+    def version(self) -> int:
+        """Counter bumped whenever the loaded models change, for caching results derived from them"""
+        return self._version
     
-    def refresh_from_store(self, store_path: str):
+    def refresh_from_store(self, store_path: str, force: bool = False):
         """Refresh memory tree from file-based store
         
+        Only model directories stored again (or whose mtime changed) since the
+        last refresh are re-read; unchanged models keep their existing indexes
+        and models whose directories vanished are dropped. The new tree is built
+        aside and swapped in once complete, so queries running concurrently keep
+        seeing the previous tree until then.
+        
         Args:
             store_path: Path to the file-based data store
+            force: Re-read every model directory even if unchanged
+        """
+        models: Dict = {}
+        stamps: Dict[str, tuple] = {}
+        
+        if os.path.isdir(store_path):
+            generations = read_generations(store_path)[1]
+            
+            # Iterate through each model directory
+            with os.scandir(store_path) as entries:
+                for entry in entries:
+                    # Hidden directories (such as the store's staging area) are not models
+                    if not entry.is_dir() or entry.name.startswith('.'):
+                        continue
+                    
+                    model_name = sys.intern(entry.name)
+                    stamp = _model_stamp(generations, model_name, entry.stat())
+                    if (not force and self._stamps.get(model_name) == stamp
+                            and model_name in self.models):
+                        models[model_name] = self.models[model_name]
+                    else:
+                        models[model_name] = self._load_model(entry.path)
+                    stamps[model_name] = stamp
+        
+        self.models = models
+        self._stamps = stamps
+        self._invalidate_caches()
+    
+    def insert_model(self, model_name: str, model_path: str):
+        """Load one stored model into the tree, adding it or replacing its previous version
+        
+        Cheaper than refresh_from_store after a single model was stored: the
+        other model directories are neither scanned nor re-read. The tree is
+        swapped in as a whole, as in refresh_from_store.
+        
+        Args:
+            model_name: Name of the model (its directory name)
+            model_path: Path of the model directory
         """
-        self.models = {}
+        model_name = sys.intern(model_name)
+        generations = read_generations(os.path.dirname(os.path.abspath(model_path)))[1]
+        stamp = _model_stamp(generations, model_name, os.stat(model_path))
+        model = self._load_model(model_path)
         
-        if not os.path.isdir(store_path):
-            return
+        models = dict(self.models)
+        models[model_name] = model
+        stamps = dict(self._stamps)
+        stamps[model_name] = stamp
         
-        # Iterate through each model directory
-        for model_name in os.listdir(store_path):
-            model_path = os.path.join(store_path, model_name)
+        self.models = models
+        self._stamps = stamps
+        self._invalidate_caches()
+    
+    def _invalidate_caches(self):
+        """Drop cached query results after self.models was replaced"""
+        self._version += 1
+        self._cached_models.cache_clear()
+        self._cached_entity_types.cache_clear()
+        self._cached_component_types.cache_clear()
+        self._cached_component_guids_by_type.cache_clear()
+        self._query_cache.clear()
+    
+    def _cached_query(self, key: tuple, compute):
+        """Return the cached result of a GUID query, computing it on a miss
+        
+        The tree version is part of every cache key, here and as the first
+        argument of the lru_cache-wrapped *_for methods; it only distinguishes
+        entries across refreshes, so results from a previous tree are never served.
+        
+        Args:
+            key: Query name followed by the hashable forms of its arguments
+            compute: Callable producing the (immutable) result
+        """
+        cache_key = (self._version,) + key
+        result = self._query_cache.get(cache_key)
+        if result is None:
+            result = compute()
+            if len(self._query_cache) >= QUERY_CACHE_SIZE:
+                self._query_cache.clear()
+            self._query_cache[cache_key] = result
+        return result
+    
+    def _load_model(self, model_path: str) -> ModelIndex:
+        """Read one model directory and build its query indexes
+        
+        Shards whose index carries each record's GUIDs and types are indexed
+        from that alone and their components decoded on demand; older shards
+        and legacy directories are decoded in full first.
+        
+        Args:
+            model_path: Path of the model directory
             
-            if not os.path.isdir(model_path):
-                continue
+        Returns:
+            ModelIndex holding the indexes
+        """
+        shard = read_shard(model_path)
+        if shard is not None:
+            buffer, index, decode = shard
+            first = next(iter(index.values()), None)
+            if first is not None and len(first) > 2:
+                rows = ((guid, entity_guid, entity_type, component_type, (offset, length))
+                        for offset, length, guid, entity_guid, entity_type, component_type in index.values())
+                return self._index_rows(rows, LazyComponents(buffer, decode))
+        return self._index_components(read_components(model_path))
+    
+    def _index_components(self, components: List[Dict]) -> ModelIndex:
+        """Build the query indexes of one model from its components
+        
+        Args:
+            components: List of component dictionaries
             
-            # Initialize model structure
-            self.models[model_name] = {
-                'by_entity': {},      # entity_guid -> [componentGuids]
-                'by_type': {},        # component_type -> [componentGuids]
-                'by_entityType': {},  # entity_type -> [entity_guids]
-                'entity_types': {},   # entity_guid -> entity_type
-                'by_componentGuid': {}         # componentGuid -> component_data
-            }
+        Returns:
+            ModelIndex holding the indexes
+        """
+        rows = ((component.get('componentGuid'), component.get('entityGuid'), component.get('entityType'),
+                 component.get('componentType', 'Unknown'), component)
+                for component in components)
+        return self._index_rows(rows, {})
+    
+    def _index_rows(self, rows, by_componentGuid: Dict) -> ModelIndex:
+        """Build the query indexes of one model
+        
+        Args:
+            rows: Iterable of (componentGuid, entityGuid, entityType,
+                componentType, component) tuples, one per component
+            by_componentGuid: Empty mapping to fill with componentGuid -> component
             
-            # Load all components for this model
-            for filename in os.listdir(model_path):
-                if not filename.endswith('.json'):
+        Returns:
+            ModelIndex holding the indexes
+        """
+        # One sweep over the components builds every index, with buckets
+        # collected in lists and frozen once complete
+        by_entity = defaultdict(list)      # entity_guid -> [componentGuids]
+        by_type = defaultdict(list)        # component_type -> [componentGuids]
+        by_entityType = defaultdict(list)  # entity_type -> [entity_guids]
+        entity_types = {}                  # entity_guid -> entity_type
+        entity_of_component = {}           # componentGuid -> entity_guid
+        
+        # Bound once; the loop below runs once per component
+        intern = sys.intern
+        get_entity_type = entity_types.get
+        
+        # dict's own setitem, so lazy spans are stored undecoded
+        set_component = dict.__setitem__
+        
+        for component_guid, entity_guid, entity_type, component_type, component in rows:
+            try:
+                # Skip components without a GUID
+                if not component_guid:
                     continue
                 
-                component_path = os.path.join(model_path, filename)
-                try:
-                    with open(component_path, 'r') as f:
-                        component = json.load(f)
-                    
-                    # Get component GUID
-                    component_guid = component.get('componentGuid')
-                    if not component_guid:
-                        continue
-                    
-                    # Store by GUID
-                    self.models[model_name]['by_componentGuid'][component_guid] = component
-                    
-                    # Index by entity GUID
-                    entity_guid = component.get('entityGuid')
-                    if entity_guid:
-                        if entity_guid not in self.models[model_name]['by_entity']:
-                            self.models[model_name]['by_entity'][entity_guid] = []
-                        self.models[model_name]['by_entity'][entity_guid].append(component_guid)
+                # Store by GUID
+                set_component(by_componentGuid, component_guid, component)
+                
+                # Index by entity GUID
+                if entity_guid:
+                    by_entity[entity_guid].append(component_guid)
+                    entity_of_component[component_guid] = entity_guid
 
-                        # Track entity type from component's entityType field
-                        entity_type = component.get('entityType')
-                        if entity_type:
-                            # Check for conflicts (same entity with different types)
-                            if entity_guid in self.models[model_name]['entity_types']:
-                                existing_type = self.models[model_name]['entity_types'][entity_guid]
-                                if existing_type != entity_type:
-                                    print(f"⚠️  WARNING: Entity {entity_guid} has conflicting types: '{existing_type}' vs '{entity_type}'")
-                                    print(f"   Component 1: {self.models[model_name]['by_entity'][entity_guid][0]}")
-                                    print(f"   Component 2: {component_guid}")
-                            else:
-                                # Store the entity type
-                                self.models[model_name]['entity_types'][entity_guid] = entity_type
-                                
-                                # Index entity GUID by type
-                                if entity_type not in self.models[model_name]['by_entityType']:
-                                    self.models[model_name]['by_entityType'][entity_type] = []
-                                self.models[model_name]['by_entityType'][entity_type].append(entity_guid)
-                    
-                    # Index by component type (remove trailing "Component")
-                    component_type = component.get('componentType', 'Unknown')
-                    if component_type.endswith('Component'):
-                        component_type = component_type[:-9]  # Remove 'Component'
-                    
-                    if component_type not in self.models[model_name]['by_type']:
-                        self.models[model_name]['by_type'][component_type] = []
-                    self.models[model_name]['by_type'][component_type].append(component_guid)
-                    
-                except Exception as e:
-                    print(f"Error loading component {filename}: {e}")
+                    # Track entity type from component's entityType field
+                    if entity_type:
+                        # Type names repeat across components; share one string
+                        # object per type so index keys compare by identity
+                        entity_type = intern(entity_type)
+                        
+                        # Check for conflicts (same entity with different types)
+                        existing_type = get_entity_type(entity_guid)
+                        if existing_type is None:
+                            # Store the entity type and index entity GUID by type
+                            entity_types[entity_guid] = entity_type
+                            by_entityType[entity_type].append(entity_guid)
+                        elif existing_type != entity_type:
+                            print(f"⚠️  WARNING: Entity {entity_guid} has conflicting types: '{existing_type}' vs '{entity_type}'")
+                            print(f"   Component 1: {by_entity[entity_guid][0]}")
+                            print(f"   Component 2: {component_guid}")
+                else:
+                    # A later duplicate of this GUID without an entity replaces it
+                    entity_of_component.pop(component_guid, None)
+                
+                # Index by component type (remove trailing "Component")
+                component_type = intern(component_type.removesuffix('Component'))
+                
+                by_type[component_type].append(component_guid)
+                
+            except Exception as e:
+                print(f"Error loading component {component_guid}: {e}")
+        
+        # The buckets never change after the build. Entity buckets are tuples
+        # (smaller than lists); type buckets are frozensets, which union into
+        # query result sets without rehashing their members
+        return ModelIndex(
+            by_entity={k: tuple(v) for k, v in by_entity.items()},
+            by_type={k: frozenset(v) for k, v in by_type.items()},
+            by_entityType={k: frozenset(v) for k, v in by_entityType.items()},
+            entity_types=entity_types,
+            by_componentGuid=by_componentGuid,
+            entity_of_component=entity_of_component
+        )
     
     def get_entity_guids(self, 
                         models: Optional[List[str]] = None,
                         entity_types: Optional[List[str]] = None,
-                        components: Optional[List[str]] = None) -> List[str]:
+                        components: Optional[List[str]] = None) -> Tuple[str, ...]:
         """Query for entity GUIDs
         
         Args:
@@ -108,48 +380,108 @@ class MemoryTree:
             components: List of component GUIDs to filter by (None = all components)
             
         Returns:
-            List of entity GUIDs matching the criteria
+            Sorted tuple of entity GUIDs matching the criteria (cached until the next refresh)
         """
+        return self._cached_query(
+            ('get_entity_guids', _cache_key(models), _cache_key(entity_types), _cache_key(components)),
+            lambda: self._entity_guids_for(models, entity_types, components))
+    
+    def _entity_guids_for(self,
+                          models: Optional[List[str]],
+                          entity_types: Optional[List[str]],
+                          components: Optional[List[str]]) -> Tuple[str, ...]:
+        """Uncached get_entity_guids"""
         # Determine which models to search
         search_models = models if models else list(self.models.keys())
         
         entity_guids: Set[str] = set()
+        parts: List[Tuple[str, ...]] = []  # presorted results of unfiltered models
         
         for model_name in search_models:
             if model_name not in self.models:
                 continue
             
             model = self.models[model_name]
-            model_entities: Set[str] = set()
             
-            # If entity_types specified, get entities of those types
+            # If components specified, collect those components' entities
+            component_entities: Optional[Set[str]] = None
+            if components:
+                # One reverse-index lookup per GUID; components are not decoded
+                entity_of_component = model.entity_of_component
+                component_entities = set(map(entity_of_component.__getitem__,
+                                             filter(entity_of_component.__contains__, components)))
+            
+            # If entity_types specified, get entities of those types (one
+            # union over all matching buckets)
             if entity_types:
-                for entity_type in entity_types:
-                    if entity_type in model['by_entityType']:
-                        model_entities.update(model['by_entityType'][entity_type])
+                by_entityType = model.by_entityType
+                model_entities: Set[str] = set().union(
+                    *[by_entityType[t] for t in entity_types if t in by_entityType])
+                
+                # Filter to the components' entities
+                if component_entities is not None:
+                    model_entities = model_entities & component_entities  # iterates the smaller set
+            elif component_entities is not None:
+                # Every indexed component's entity is in the model, so no need
+                # to copy all of its entity GUIDs just to intersect them away
+                model_entities = component_entities
             else:
-                # Get all entity GUIDs in this model
-                model_entities.update(model['by_entity'].keys())
-            
-            # If components specified, filter to only those components' entities
-            if components:
-                component_entities: Set[str] = set()
-                for component_guid in components:
-                    if component_guid in model['by_componentGuid']:
-                        entity_guid = model['by_componentGuid'][component_guid].get('entityGuid')
-                        if entity_guid:
-                            component_entities.add(entity_guid)
-                model_entities.intersection_update(component_entities)
+                # All entity GUIDs in this model, already sorted
+                parts.append(model.sorted_entity_guids)
+                continue
             
             # Union with result from other models
             entity_guids.update(model_entities)
         
-        return sorted(list(entity_guids))
+        if entity_guids or not parts:
+            parts.append(tuple(sorted(entity_guids)))
+        return _merge_sorted(parts)
+    
+    def get_entity_guids_by_model(self,
+                                  models: Optional[List[str]] = None,
+                                  entity_types: Optional[List[str]] = None) -> Dict[str, Tuple[str, ...]]:
+        """Query for entity GUIDs, grouped by model, in a single pass
+        
+        Args:
+            models: List of model names (None = all models)
+            entity_types: List of entity types to filter by (None = all types).
+                Models containing none of these types are skipped.
+            
+        Returns:
+            Dictionary mapping model names to sorted tuples of entity GUIDs (models
+            without matches are omitted)
+        """
+        return self._cached_query(
+            ('get_entity_guids_by_model', _cache_key(models, ordered=True), _cache_key(entity_types)),
+            lambda: self._entity_guids_by_model_for(models, entity_types)).copy()
+    
+    def _entity_guids_by_model_for(self,
+                                   models: Optional[List[str]],
+                                   entity_types: Optional[List[str]]) -> Dict[str, Tuple[str, ...]]:
+        """Uncached get_entity_guids_by_model"""
+        search_models = models if models else list(self.models.keys())
+        result: Dict[str, Tuple[str, ...]] = {}
+        
+        for model_name in search_models:
+            model = self.models.get(model_name)
+            if model is None:
+                continue
+            
+            if entity_types:
+                by_entityType = model.by_entityType
+                model_entities: Set[str] = set().union(
+                    *[by_entityType[t] for t in entity_types if t in by_entityType])
+                if model_entities:
+                    result[model_name] = tuple(sorted(model_entities))
+            elif model.sorted_entity_guids:
+                result[model_name] = model.sorted_entity_guids
+        
+        return result
     
     def get_component_guids(self,
                            models: Optional[List[str]] = None,
                            entity_guids: Optional[List[str]] = None,
-                           entity_types: Optional[List[str]] = None) -> List[str]:
+                           entity_types: Optional[List[str]] = None) -> Tuple[str, ...]:
         """Query for component GUIDs
         
         Args:
@@ -158,71 +490,132 @@ class MemoryTree:
             entity_types: List of entity types to filter by (None = all types)
             
         Returns:
-            List of component GUIDs matching the criteria
+            Sorted tuple of component GUIDs matching the criteria (cached until the next refresh)
         """
+        return self._cached_query(
+            ('get_component_guids', _cache_key(models), _cache_key(entity_guids), _cache_key(entity_types)),
+            lambda: self._component_guids_for(models, entity_guids, entity_types))
+    
+    def _component_guids_for(self,
+                             models: Optional[List[str]],
+                             entity_guids: Optional[List[str]],
+                             entity_types: Optional[List[str]]) -> Tuple[str, ...]:
+        """Uncached get_component_guids"""
         # Determine which models to search
         search_models = models if models else list(self.models.keys())
-        print(f"\n🔍 get_component_guids ENTRY:")
-        print(f"   Input models param: {models}")
-        print(f"   Determined search_models: {search_models}")
-        print(f"   Available models: {list(self.models.keys())}")
-        print(f"   entity_types: {entity_types}")
-        print(f"   entity_guids: {entity_guids}")
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug("get_component_guids: models=%s entity_types=%s entity_guids=%s",
+                      search_models, entity_types, entity_guids)
         
-        result_guids: Set[str] = None
+        result_guids: Set[str] = set()
+        parts: List[Tuple[str, ...]] = []  # presorted results of unfiltered models
         
         for model_name in search_models:
             if model_name not in self.models:
-                print(f"  ⚠️  Model '{model_name}' not found in available models: {list(self.models.keys())}")
+                if debug:
+                    log.debug("get_component_guids: model %r not loaded", model_name)
                 continue
             
-            print(f"\n  Processing model: {model_name}")
             model = self.models[model_name]
-            model_guids: Set[str] = set()
+            by_entity = model.by_entity
+            by_entityType = model.by_entityType
             filter_entity_guids: Set[str] = set()
             
             # If entity_types specified, get entity GUIDs for those types
             if entity_types:
-                for entity_type in entity_types:
-                    if entity_type in model['by_entityType']:
-                        filter_entity_guids.update(model['by_entityType'][entity_type])
-                print(f"    Found {len(filter_entity_guids)} entities with matching types")
+                filter_entity_guids = filter_entity_guids.union(
+                    *[by_entityType[t] for t in entity_types if t in by_entityType])
             
             # If entity_guids specified, add them to the filter
             if entity_guids:
                 filter_entity_guids.update(entity_guids)
-                print(f"    Filter entities now: {len(filter_entity_guids)}")
             
-            # Get components for the filtered entities
+            # Get components for the filtered entities; all buckets are merged
+            # in a single union call rather than one update() per entity
             if filter_entity_guids:
-                for entity_guid in filter_entity_guids:
-                    if entity_guid in model['by_entity']:
-                        model_guids.update(model['by_entity'][entity_guid])
-                print(f"    Found {len(model_guids)} components for filtered entities")
+                model_guids: Set[str] = set().union(
+                    *[by_entity[g] for g in filter_entity_guids if g in by_entity])
             else:
-                # No entity-level filters, get all components
-                model_guids = set(model['by_componentGuid'].keys())
-                print(f"    No entity filters - getting all {len(model_guids)} components from this model")
+                # No entity-level filters: all components, already sorted
+                parts.append(model.sorted_component_guids)
+                continue
             
             # Union with result from other models
-            if result_guids is None:
-                result_guids = model_guids
-                print(f"    First model - initialized result_guids with {len(result_guids)} components")
-            else:
-                before = len(result_guids)
-                result_guids.update(model_guids)
-                print(f"    Added {len(model_guids)} components (total now: {len(result_guids)}, added: {len(result_guids) - before})")
+            result_guids.update(model_guids)
+        
+        if result_guids or not parts:
+            parts.append(tuple(sorted(result_guids)))
+        result = _merge_sorted(parts)
+        if debug:
+            log.debug("get_component_guids: returning %d components", len(result))
+        return result
+    
+    def get_component_guids_by_model(self,
+                                     models: Optional[List[str]] = None,
+                                     entity_guids: Optional[List[str]] = None,
+                                     entity_types: Optional[List[str]] = None) -> Dict[str, Tuple[str, ...]]:
+        """Query for component GUIDs, grouped by model, in a single pass
+        
+        Args:
+            models: List of model names (None = all models)
+            entity_guids: List of entity GUIDs to filter by (None = all entities)
+            entity_types: List of entity types to filter by (None = all types).
+                Models containing none of these types are skipped.
+            
+        Returns:
+            Dictionary mapping model names to sorted tuples of component GUIDs (models
+            without matches are omitted)
+        """
+        return self._cached_query(
+            ('get_component_guids_by_model', _cache_key(models, ordered=True), _cache_key(entity_guids), _cache_key(entity_types)),
+            lambda: self._component_guids_by_model_for(models, entity_guids, entity_types)).copy()
+    
+    def _component_guids_by_model_for(self,
+                                      models: Optional[List[str]],
+                                      entity_guids: Optional[List[str]],
+                                      entity_types: Optional[List[str]]) -> Dict[str, Tuple[str, ...]]:
+        """Uncached get_component_guids_by_model"""
+        search_models = models if models else list(self.models.keys())
+        result: Dict[str, Tuple[str, ...]] = {}
         
-        final_count = len(result_guids or set())
-        print(f"\n✓ get_component_guids EXIT: Returning {final_count} total components")
-        return sorted(list(result_guids or set()))
+        for model_name in search_models:
+            model = self.models.get(model_name)
+            if model is None:
+                continue
+            
+            filter_entity_guids: Set[str] = set()
+            
+            if entity_types:
+                by_entityType = model.by_entityType
+                model_types = [by_entityType[t] for t in entity_types if t in by_entityType]
+                if not model_types:
+                    continue
+                filter_entity_guids = filter_entity_guids.union(*model_types)
+            
+            if entity_guids:
+                filter_entity_guids.update(entity_guids)
+            
+            if filter_entity_guids:
+                by_entity = model.by_entity
+                model_guids: Set[str] = set().union(
+                    *[by_entity[g] for g in filter_entity_guids if g in by_entity])
+                if model_guids:
+                    result[model_name] = tuple(sorted(model_guids))
+            elif model.sorted_component_guids:
+                result[model_name] = model.sorted_component_guids
+        
+        return result
     
-    def get_components(self, guids: List[str], models: Optional[List[str]] = None):
+    def get_components(self, guids: List[str], models: Optional[List[str]] = None,
+                       readonly: bool = False):
         """Retrieve component data by GUIDs
         
         Args:
             guids: List of component GUIDs to retrieve
             models: List of model names to search (None = all models)
+            readonly: Return the tree's own component dicts instead of copies;
+                the caller must not modify them
             
         Returns:
             Tuple of (components_list, guid_to_model_dict)
@@ -232,23 +625,44 @@ class MemoryTree:
         components = []
         guid_to_model = {}
         
-        # Determine which models to search
-        search_models = models if models else list(self.models.keys())
+        for model_name, component in self.iter_components(guids, models, readonly=readonly):
+            components.append(component)
+            guid_to_model[component['componentGuid']] = model_name
         
-        # Search only the specified models for the GUIDs
-        for model_name in search_models:
-            if model_name not in self.models:
-                continue
-                
-            model = self.models[model_name]
+        return components, guid_to_model
+    
+    def iter_components(self, guids: List[str], models: Optional[List[str]] = None,
+                        readonly: bool = False):
+        """Lazily retrieve component data by GUIDs, grouped by model
+        
+        The models to search are resolved when this is called, so a refresh
+        running while the result is consumed does not affect it.
+        
+        Args:
+            guids: List of component GUIDs to retrieve
+            models: List of model names to search (None = all models)
+            readonly: Yield the tree's own component dicts instead of copies
+                (for callers that only serialize them); they must not be modified
             
-            for guid in guids:
-                if guid in model['by_componentGuid']:
-                    component = model['by_componentGuid'][guid].copy()
-                    components.append(component)
-                    guid_to_model[guid] = model_name
+        Returns:
+            Iterator of (model_name, component) tuples; all components of one
+            model are yielded before those of the next
+        """
+        # Determine which models to search; a model named twice is searched
+        # once, so each model's components form a single group
+        search_models = dict.fromkeys(models) if models else list(self.models.keys())
+        model_indexes = [(name, self.models[name].by_componentGuid)
+                         for name in search_models if name in self.models]
         
-        return components, guid_to_model
+        def generate():
+            for model_name, by_componentGuid in model_indexes:
+                # Most GUIDs miss in all but one model; filter() runs the
+                # membership tests in C instead of a Python-level if per GUID
+                for guid in filter(by_componentGuid.__contains__, guids):
+                    component = by_componentGuid[guid]
+                    yield model_name, component if readonly else component.copy()
+        
+        return generate()
     
     def get_models(self) -> List[str]:
         """Get list of all loaded models
@@ -256,7 +670,11 @@ class MemoryTree:
         Returns:
             List of model names
         """
-        return sorted(list(self.models.keys()))
+        return list(self._cached_models(self._version))
+    
+    def _models_for(self, version: int) -> Tuple[str, ...]:
+        """Uncached get_models"""
+        return tuple(sorted(self.models.keys()))
     
     def get_entity_types(self, models: Optional[List[str]] = None) -> List[str]:
         """Get list of all entity types across models
@@ -267,14 +685,16 @@ class MemoryTree:
         Returns:
             List of entity types
         """
+        return list(self._cached_entity_types(self._version, _cache_key(models)))
+    
+    def _entity_types_for(self, version: int, models: Optional[Tuple[str, ...]]) -> Tuple[str, ...]:
+        """Uncached get_entity_types"""
         search_models = models if models else list(self.models.keys())
         types: Set[str] = set()
         
-        for model_name in search_models:
-            if model_name in self.models:
-                types.update(self.models[model_name]['by_entityType'].keys())
+        types.update(*[self.models[m].by_entityType.keys() for m in search_models if m in self.models])
         
-        return sorted(list(types))
+        return tuple(sorted(types))
     
     def get_component_types(self, models: Optional[List[str]] = None) -> List[str]:
         """Get list of all component types across models
@@ -285,14 +705,16 @@ class MemoryTree:
         Returns:
             List of component types
         """
+        return list(self._cached_component_types(self._version, _cache_key(models)))
+    
+    def _component_types_for(self, version: int, models: Optional[Tuple[str, ...]]) -> Tuple[str, ...]:
+        """Uncached get_component_types"""
         search_models = models if models else list(self.models.keys())
         types: Set[str] = set()
         
-        for model_name in search_models:
-            if model_name in self.models:
-                types.update(self.models[model_name]['by_type'].keys())
+        types.update(*[self.models[m].by_type.keys() for m in search_models if m in self.models])
         
-        return sorted(list(types))
+        return tuple(sorted(types))
     
     def get_component_guids_by_type(self, 
                                     component_types: Optional[List[str]] = None,
@@ -306,28 +728,34 @@ class MemoryTree:
         Returns:
             List of component GUIDs matching the criteria
         """
+        return list(self._cached_component_guids_by_type(
+            self._version, _cache_key(component_types), _cache_key(models)))
+    
+    def _component_guids_by_type_for(self,
+                                     version: int,
+                                     component_types: Optional[Tuple[str, ...]],
+                                     models: Optional[Tuple[str, ...]]) -> Tuple[str, ...]:
+        """Uncached get_component_guids_by_type"""
         # Determine which models to search
         search_models = models if models else list(self.models.keys())
         
         result_guids: Set[str] = set()
+        parts: List[Tuple[str, ...]] = []  # presorted results of unfiltered models
         
         for model_name in search_models:
             if model_name not in self.models:
                 continue
             
             model = self.models[model_name]
-            model_guids: Set[str] = set()
             
             # If component_types specified, get components of those types
             if component_types:
-                for comp_type in component_types:
-                    if comp_type in model['by_type']:
-                        model_guids.update(model['by_type'][comp_type])
+                by_type = model.by_type
+                result_guids.update(*[by_type[t] for t in component_types if t in by_type])
             else:
-                # No type filters, get all components
-                model_guids = set(model['by_componentGuid'].keys())
-            
-            # Union with result from other models
-            result_guids.update(model_guids)
+                # No type filters: all components, already sorted
+                parts.append(model.sorted_component_guids)
         
-        return sorted(list(result_guids))
+        if result_guids or not parts:
+            parts.append(tuple(sorted(result_guids)))
+        return _merge_sorted(parts)
@@ -1,6 +1,6 @@
 """MongoDB-based data store for IFC components"""
 
-from typing import List, Dict, Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class MongoDBStore:
@@ -40,71 +40,21 @@ class MongoDBStore:
         print(f"    Models Collection: {self.models_collection}")
         print(f"\n    TODO: Implement MongoDB connection and operations")
     
-    def connect(self):
-        """Connect to MongoDB database
-        
-        This method needs to be implemented with actual MongoDB driver
-        Example using pymongo:
-            from pymongo import MongoClient
-            self.client = MongoClient(self.connection_uri)
-            self.db = self.client[self.db_name]
-        """
-        raise NotImplementedError("MongoDB connection not yet implemented. Install pymongo and configure connection string.")
-    
-    def store(self, filename: str, components: List[Dict]) -> Dict:
-        """Store components from a file
-        
-        Args:
-            filename: Name of the source file
-            components: List of component dictionaries
-            
-        Returns:
-            Dictionary with store result information
-        """
-        raise NotImplementedError("MongoDB store operation not yet implemented. Configure MongoDB connection.")
-    
-    def retrieve(self, model_name: str, **filters) -> List[Dict]:
-        """Retrieve components with optional filtering
-        
-        Args:
-            model_name: Name of the model to retrieve from
-            **filters: Optional filter criteria (entity_guid, component_type, etc.)
-            
-        Returns:
-            List of component dictionaries
-        """
-        raise NotImplementedError("MongoDB retrieve operation not yet implemented. Configure MongoDB connection.")
+    # Store operations still to implement against a MongoDB driver
+    _UNIMPLEMENTED = frozenset({
+        'connect', 'store', 'retrieve', 'delete', 'list_models', 'get_model_stats',
+    })
     
-    def delete(self, model_name: str, component_guid: str) -> bool:
-        """Delete a component
-        
-        Args:
-            model_name: Name of the model
-            component_guid: GUID of the component to delete
-            
-        Returns:
-            True if deleted, False if not found
-        """
-        raise NotImplementedError("MongoDB delete operation not yet implemented. Configure MongoDB connection.")
-    
-    def list_models(self) -> List[Dict]:
-        """List all stored models
-        
-        Returns:
-            List of model dictionaries with metadata
-        """
-        raise NotImplementedError("MongoDB list_models operation not yet implemented. Configure MongoDB connection.")
-    
-    def get_model_stats(self, model_name: str) -> Dict:
-        """Get statistics for a model
-        
-        Args:
-            model_name: Name of the model
-            
-        Returns:
-            Dictionary with model statistics (component count, entity types, etc.)
+    def __getattr__(self, name):
+        """Reject store operations until a MongoDB driver is wired in
+
+        Only called for attributes not set in __init__, so the configuration
+        fields above stay readable. Names outside _UNIMPLEMENTED raise
+        AttributeError as usual, so hasattr() keeps working.
         """
-        raise NotImplementedError("MongoDB get_model_stats operation not yet implemented. Configure MongoDB connection.")
+        if name in type(self)._UNIMPLEMENTED:
+            raise NotImplementedError(f"{type(self).__name__}.{name} requires MongoDB connection configured.")
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
     
     def close(self):
         """Close connection to MongoDB"""
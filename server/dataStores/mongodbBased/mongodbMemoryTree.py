@@ -1,6 +1,6 @@
 """MongoDB memory tree - In-memory cache layer for MongoDB backend"""
 
-from typing import Dict, List, Optional, Set
+from typing import Dict, Optional
 
 class MongoDBMemoryTree:
     """Memory tree for MongoDB backend with optional caching layer
@@ -23,86 +23,24 @@ class MongoDBMemoryTree:
         print(f"    Connected store: {mongo_store is not None}")
         print(f"\n    TODO: Implement MongoDB-backed memory tree operations")
     
-    def refresh(self) -> int:
-        """Refresh memory tree from MongoDB backend
-        
-        Returns:
-            Number of models loaded
-        """
-        raise NotImplementedError("MongoDB refresh operation not yet implemented. Configure MongoDB connection.")
-    
-    def refresh_from_store(self, store_path: str):
-        """Placeholder for compatibility with file-based interface
-        
-        Args:
-            store_path: Ignored for MongoDB backend
-        """
-        raise NotImplementedError("Use refresh() method for MongoDB backend")
-    
-    def get_entity_guids(self, 
-                        models: Optional[List[str]] = None,
-                        entity_types: Optional[List[str]] = None,
-                        components: Optional[List[str]] = None) -> List[str]:
-        """Query for entity GUIDs from MongoDB
-        
-        Args:
-            models: List of model names (None = all models)
-            entity_types: List of entity types to filter by
-            components: List of component GUIDs to filter by
-            
-        Returns:
-            List of entity GUIDs matching criteria
-        """
-        raise NotImplementedError("MongoDB get_entity_guids operation not yet implemented.")
-    
-    def get_component_guids(self,
-                           models: Optional[List[str]] = None,
-                           entity_guids: Optional[List[str]] = None,
-                           entity_types: Optional[List[str]] = None) -> List[str]:
-        """Query for component GUIDs from MongoDB
-        
-        Args:
-            models: List of model names (None = all models)
-            entity_guids: List of entity GUIDs to filter by
-            entity_types: List of entity types to filter by
-            
-        Returns:
-            List of component GUIDs matching criteria
-        """
-        raise NotImplementedError("MongoDB get_component_guids operation not yet implemented.")
-    
-    def get_components(self, guids: List[str], models: Optional[List[str]] = None):
-        """Retrieve component data by GUIDs from MongoDB
-        
-        Args:
-            guids: List of component GUIDs to retrieve
-            models: List of model names to search (None = search all)
-            
-        Returns:
-            Tuple of (components_list, guid_to_model_dict)
-            - components_list: List of component dictionaries
-            - guid_to_model_dict: Dict mapping each component GUID to its model name
-        """
-        raise NotImplementedError("MongoDB get_components operation not yet implemented.")
-    
-    def get_models(self) -> List[str]:
-        """Get list of all loaded models from MongoDB
-        
-        Returns:
-            List of model names
-        """
-        raise NotImplementedError("MongoDB get_models operation not yet implemented.")
-    
-    def get_entity_types(self, models: Optional[List[str]] = None) -> List[str]:
-        """Get list of all entity types from MongoDB
-        
-        Args:
-            models: List of model names (None = all models)
-            
-        Returns:
-            List of entity types
+    # Queries mirroring MemoryTree that still need a MongoDB implementation
+    _UNIMPLEMENTED = frozenset({
+        'refresh', 'refresh_from_store',
+        'get_entity_guids', 'get_entity_guids_by_model',
+        'get_component_guids', 'get_component_guids_by_model',
+        'get_components', 'iter_components',
+        'get_models', 'get_entity_types',
+    })
+    
+    def __getattr__(self, name):
+        """Reject queries until the MongoDB backend is implemented
+
+        Only called for attributes not set in __init__. Names outside
+        _UNIMPLEMENTED raise AttributeError as usual, so hasattr() keeps working.
         """
-        raise NotImplementedError("MongoDB get_entity_types operation not yet implemented.")
+        if name in type(self)._UNIMPLEMENTED:
+            raise NotImplementedError(f"{type(self).__name__}.{name} requires MongoDB connection configured.")
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
     
     def cache_model(self, model_name: str):
         """Load a model into memory cache from MongoDB
@@ -6,8 +6,11 @@ This example shows how to:
 3. Query components
 """
 
+import argparse
+import contextlib
 import os
 import sys
+import time
 
 # Add server to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -88,14 +91,12 @@ def example_query_components():
         # Get entity GUIDs
         entity_guids = server.memory_tree.get_entity_guids(models=[model_name])
         print(f"  Entities: {len(entity_guids)} (showing first 5)")
-        for guid in entity_guids[:5]:
-            print(f"    - {guid}")
+        print('\n'.join(f"    - {guid}" for guid in entity_guids[:5]))
         
         # Get component GUIDs
         component_guids = server.memory_tree.get_component_guids(models=[model_name])
         print(f"\n  Components: {len(component_guids)} (showing first 5)")
-        for guid in component_guids[:5]:
-            print(f"    - {guid}")
+        print('\n'.join(f"    - {guid}" for guid in component_guids[:5]))
         
         # Get entity types
         entity_types = server.memory_tree.get_entity_types(models=[model_name])
@@ -191,6 +192,22 @@ See BACKEND_INTERFACE.md for full implementation guide.
 
 def main():
     """Run all examples"""
+    parser = argparse.ArgumentParser(description='Run the IFC Processing Server usage examples')
+    parser.add_argument('--quiet',
+                        action='store_true',
+                        help='Discard example output and only report the total run time (for profiling)')
+    args = parser.parse_args()
+    
+    if args.quiet:
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            run_examples()
+        print(f"Examples completed in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    else:
+        run_examples()
+
+def run_examples():
+    """Run every example in order"""
     print("""
 ╔═══════════════════════════════════════════════════════════════╗
 ║     IFC Processing Server - Usage Examples                   ║
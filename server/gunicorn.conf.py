@@ -0,0 +1,17 @@
+"""Gunicorn configuration for the IFC Processing Server"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# One process per core, each serving requests on a few threads
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Load the app (and its memory tree) once in the master so workers share it
+# copy-on-write instead of each building their own
+preload_app = True
+
+# Converting large IFC uploads can take minutes
+timeout = 300
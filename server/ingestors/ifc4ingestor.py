@@ -6,10 +6,14 @@
 
 from datetime import datetime
 import hashlib
+import os
 import uuid
-import json
 import sys
 import argparse
+from functools import lru_cache
+from operator import itemgetter
+
+import orjson
 
 try:
     import ifcopenshell
@@ -24,13 +28,19 @@ from utils import toLowerCamelcase, generateDeterministicGuid, expandGuid
 
 INCLUDE_EMPTY_PROPERTIES = False
 
+# Threads used by the geometry iterator when generating OBJ meshes, per
+# conversion. Kept small by default: a Gunicorn deployment runs one worker per
+# core with several request threads each, so concurrent uploads would otherwise
+# each start a thread per core and starve request handling.
+GEOMETRY_THREADS = int(os.environ.get('IFCX_GEOMETRY_THREADS', min(2, os.cpu_count() or 1)))
+
 
-ALLOWED_TYPES = {'IfcObjectDefinition', 'IfcPropertySet', 'IfcRelationship'}
+ALLOWED_TYPES = frozenset({'IfcObjectDefinition', 'IfcPropertySet', 'IfcRelationship'})
 # ALLOWED_TYPES = {'IfcRelationship'}
 
 
 # Define attributes to exclude
-EXCLUDE_ATTRIBUTES = {
+EXCLUDE_ATTRIBUTES = frozenset({
     'ownerhistory',
     'id',
     'step_id',
@@ -41,7 +51,18 @@ EXCLUDE_ATTRIBUTES = {
     'representationcontexts',
     'unitsincontext',
     'globalId'
-}
+})
+
+# Excluded attributes that processEntry never reads, by IFC attribute name.
+# Representation is still read to decide whether to generate OBJ geometry
+SKIPPED_IFC_ATTRIBUTES = frozenset({
+    'OwnerHistory',
+    'ObjectPlacement',
+    'Representations',
+    'RepresentationMaps',
+    'RepresentationContexts',
+    'UnitsInContext'
+})
 
 # Define attribute name substitutions
 ATTRIBUTE_SUBSTITUTIONS = {
@@ -52,7 +73,42 @@ ATTRIBUTE_SUBSTITUTIONS = {
     'type': 'componentType'
 }
 
-EXPAND_GUID_ATTRIBUTES = {'GlobalId'}
+# Substituted names in their final camelCase form
+ATTRIBUTE_SUBSTITUTIONS_CAMEL = {key: toLowerCamelcase(value) for key, value in ATTRIBUTE_SUBSTITUTIONS.items()}
+
+
+@lru_cache(maxsize=None)
+def displayAttributeName(attr_name):
+    """Output key for a camelCased attribute name, or None if it is skipped
+
+    The schema has a few hundred attribute names, so the exclusion check,
+    substitution and camelCasing run once per name instead of once per entity.
+    """
+    if attr_name.lower() in EXCLUDE_ATTRIBUTES or attr_name.startswith('_'):
+        return None
+    substitution = ATTRIBUTE_SUBSTITUTIONS_CAMEL.get(attr_name)
+    return substitution if substitution is not None else toLowerCamelcase(attr_name)
+
+
+def _stream_path(stream):
+    """Path the data of a binary file object can be opened from, or None
+
+    SpooledTemporaryFile is only on disk once it has rolled over (calling
+    fileno() earlier would force that), and an anonymous temporary file is
+    reached through /proc/self/fd.
+    """
+    if getattr(stream, '_rolled', True) is False:
+        return None
+    name = getattr(stream, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+    path = f'/proc/self/fd/{fd}'
+    return path if os.path.isfile(path) else None
+
 
 class IFC2JSONSimple:
     """Simplified IFC to JSON converter that prints entity attributes"""
@@ -84,15 +140,42 @@ class IFC2JSONSimple:
         self.EMPTY_PROPERTIES = EMPTY_PROPERTIES
         self.modelName = modelName or "unknown"
 
-        # Dictionary referencing all objects with a GlobalId that are already created
-        self.rootObjects = {}
-
-        # Dictionary referencing all objects with a GlobalId that are already created
-        self.includeObjects = {}
-
         # Representations are kept seperate to be added to the end of the list
         self.representations = []
 
+        # Attribute (index, key) pairs per entity type, see attributeSchedule
+        self._attributeSchedules = {}
+
+        # (key, output key) pairs per attribute key layout, see appendAttributes
+        self._attributePlans = {}
+
+        # OBJ strings by GlobalId, built on first use, see buildObjCache
+        self._objCache = None
+
+        # Attribute value converters by exact value type, see getAttributeValueNew
+        self._valueConverters = {
+            ifcopenshell.entity_instance: self.processEntry,
+            tuple: self.getAggregateValue
+        }
+
+        # Top-level entities to convert; by_type already walks subtypes, so no
+        # per-entity is_a() filtering is needed. Sorted for a stable output order
+        self._entities_to_process = []
+
+        # Allowed type of each top-level entity by step id, so processEntry
+        # needs no is_a() calls to pick its branch
+        self._rootTypes = {}
+        for allowed_type in sorted(ALLOWED_TYPES):
+            for entity in self.ifcModel.by_type(allowed_type, include_subtypes=True):
+                if entity.id() not in self._rootTypes:
+                    self._rootTypes[entity.id()] = allowed_type
+                    self._entities_to_process.append(entity)
+
+        # GlobalId of every rooted entity by step id, read in one pass. Nested
+        # references look up here instead of probing hasattr(entity, 'GlobalId'),
+        # which raises and catches AttributeError for every non-rooted entity
+        self._globalIds = {entity.id(): entity.GlobalId for entity in self.ifcModel.by_type('IfcRoot')}
+
 
 
     # def createReferenceObject(self, currentAttributes, COMPACT=False):
@@ -114,6 +197,42 @@ class IFC2JSONSimple:
     #     ref['ref'] = expandGuid(currentAttributes['GlobalId']) if 'GlobalId' in currentAttributes else None
     #     return ref
 
+    @classmethod
+    def from_stream(cls, stream, **kwargs):
+        """IFC SPF converter for a model read from a binary file object
+
+        A stream backed by a file on disk (such as an upload Werkzeug has
+        spooled to a temporary file) is opened by path; anything else is read
+        in full and parsed from a string. Nothing is written to disk.
+
+        parameters:
+        stream: Binary file object holding an IFC SPF file, e.g. an upload stream
+        kwargs: Passed on to IFC2JSONSimple
+
+        Returns:
+        IFC2JSONSimple: Converter for the parsed model
+
+        Raises:
+        ValueError: If the stream does not hold a parseable IFC SPF file
+        """
+        if ifcopenshell is None:
+            raise RuntimeError("ifcopenshell is not installed. Cannot process IFC files.")
+        try:
+            path = _stream_path(stream)
+            if path is not None:
+                return cls(ifcopenshell.open(path, format='.ifc'), **kwargs)
+            data = stream.read()
+            try:
+                text = data.decode('utf-8')
+            except UnicodeDecodeError:
+                # SPF is ASCII by specification (other characters are escaped);
+                # latin-1 keeps the stray bytes of non-conforming files intact
+                text = data.decode('latin-1')
+            del data
+            return cls(ifcopenshell.file.from_string(text), **kwargs)
+        except ifcopenshell.Error as e:
+            raise ValueError(f"Unable to parse IFC file: {e}") from e
+
     def spf2Json(self):
         """
         Iterate through all entities in the IFC file and print their first-level attributes
@@ -121,79 +240,72 @@ class IFC2JSONSimple:
         Returns:
         list: List of dictionaries containing entity attributes
         """        
+        return list(self.iterSpf2Json())
 
+    def iterSpf2Json(self):
+        """
+        Lazily convert entities, yielding one dictionary at a time
 
-        jsonObjects = []
+        Shape representations are collected while converting and yielded last,
+        as spf2Json has always placed them at the end of the list.
 
-        for entity in self.ifcModel:
-            if hasattr(entity, 'GlobalId') and entity.GlobalId:
-                self.rootObjects[entity.id()] = guid.split(
-                    guid.expand(entity.GlobalId))[1:-1]
-        
-        # Create a list of entities by querying for each allowed type
-        entity_list = []
-        # for allowed_type in reversed(list(ALLOWED_TYPES)):
-        for allowed_type in ALLOWED_TYPES:
-            entities_of_type = self.ifcModel.by_type(allowed_type)
-            entity_list.extend(entities_of_type)
-        
-        # Iterate through all queried entities
+        Yields:
+        dict: Entity attributes
+        """
+        self.representations = []
 
-        for entity in entity_list:
+        # Iterate through all queried entities
+        for entity in self._entities_to_process:
             returnedValue = self.processEntry(entity, topLevel=True)
             if returnedValue is not None:   
-                jsonObjects.append(returnedValue)
+                yield returnedValue
 
-        jsonObjects = jsonObjects + list(self.representations)
-        return jsonObjects
+        yield from self.representations
     
     def processEntry(self, entity, topLevel=False):
         # Get entity type
-        if not topLevel and hasattr(entity, 'GlobalId'):
-            entityGuid = expandGuid(entity.GlobalId)
-            return entityGuid
+        if not topLevel:
+            globalId = self._globalIds.get(entity.id())
+            if globalId is not None:
+                return expandGuid(globalId)
         
         entity_type = entity.is_a()
+        # None for nested entities, which never take the branches below
+        root_type = self._rootTypes.get(entity.id())
         
-        entity_dict = {}
-        
-
-        
-        # Get all first-level attributes from __dict__
-        entityAttributes = entity.__dict__
-        
-        # Convert all attribute keys to toLowerCamelcase
-        entityAttributes = {toLowerCamelcase(key): value for key, value in entityAttributes.items()}
+        # Get first-level attributes with toLowerCamelcase keys
+        entityAttributes = {'type': entity_type}
+        for index, key in self.attributeSchedule(entity, entity_type):
+            entityAttributes[key] = entity[index]
 
 
-        if(entity.is_a('IfcObjectDefinition')):
+        if root_type == 'IfcObjectDefinition':
             entityAttributes['entityType'] = entity_type
-            entityAttributes['entityGuid'] = expandGuid(entity.GlobalId) 
+            entityAttributes['entityGuid'] = expandGuid(entityAttributes.pop('globalId'))
             entityAttributes['componentGuid'] = generateDeterministicGuid(self.modelName, entity_type, entityAttributes['entityGuid']) 
-            entityAttributes.pop('globalId', None)
 
-        if(entity.is_a('IfcRelationship')):
+        if root_type == 'IfcRelationship':
             # entityAttributes['entityGuid'] = ""
-            entityAttributes['componentGuid'] = expandGuid(entityAttributes['globalId']) 
-            entityAttributes.pop('globalId', None)
+            entityAttributes['componentGuid'] = expandGuid(entityAttributes.pop('globalId'))
 
 
-        if(entity.is_a('IfcPropertySet')):
-            entityAttributes['componentGuid'] = expandGuid(entity.GlobalId) 
-            entityAttributes.pop('globalId', None)
+        if root_type == 'IfcPropertySet':
+            entityAttributes['componentGuid'] = expandGuid(entityAttributes.pop('globalId'))
             if hasattr(entity, 'PropertyDefinitionOf') and len(entity.PropertyDefinitionOf) > 0:
                 relation = entity.PropertyDefinitionOf[0]
                 testentity = relation.RelatedObjects[0]
-                if hasattr(testentity, 'GlobalId'):
-                    entityAttributes['entityGuid'] = expandGuid(testentity.GlobalId)
+                testGlobalId = self._globalIds.get(testentity.id())
+                if testGlobalId is not None:
+                    entityAttributes['entityGuid'] = expandGuid(testGlobalId)
             else:
-                print(f"Warning: IfcPropertySet {entityAttributes['componentGuid']} of type {entity_type} has no related objects with GlobalId")
+                print(f"Warning: IfcPropertySet {entityAttributes['componentGuid']} of type {entity_type} has no related objects with GlobalId", file=sys.stderr)
 
         if 'representation' in entityAttributes:
                 obj = self.toObj(entity)
 
                 if obj:
-                    entityGuid = expandGuid(entity.GlobalId)
+                    # Products already carry their expanded GUID from the branch above
+                    entityGuid = entityAttributes.get('entityGuid') or expandGuid(entity.GlobalId)
                     componentGuid = generateDeterministicGuid(self.modelName, "ShapeRepresentationComponent", entityGuid)    
                     self.representations.append(
                         {
@@ -208,97 +320,151 @@ class IFC2JSONSimple:
                         }
                     )
 
-        returnedAttributes = self.appendAttributes(entityAttributes, entity_type)
-        entity_dict.update(returnedAttributes)
-        
-        # Sort entity_dict alphabetically by keys
-        entity_dict = dict(sorted(entity_dict.items()))
+        # Keys come back in alphabetical order
+        return self.appendAttributes(entityAttributes, entity_type)
 
-        return entity_dict
+    def attributeSchedule(self, entity, entity_type):
+        """Attributes to read for an entity type, computed once per type
+
+        parameters:
+        entity: ifcopenshell entity instance of entity_type
+        entity_type (str): IFC entity type name
+
+        Returns:
+        tuple: (attribute index, toLowerCamelcase key) pairs, excluded attributes
+        skipped so their values are never wrapped
+        """
+        schedule = self._attributeSchedules.get(entity_type)
+        if schedule is None:
+            schedule = self._attributeSchedules[entity_type] = tuple(
+                (index, toLowerCamelcase(attr_name))
+                for index, attr_name in enumerate(entity.wrapped_data.get_attribute_names())
+                if attr_name not in SKIPPED_IFC_ATTRIBUTES
+            )
+        return schedule
 
     def appendAttributes(self, currentAttributes, entity_type):
 
         entity_dict = {}        
         
-        keys = sorted(currentAttributes.keys())  
-            
-        for attr_name in keys:
-            # Skip excluded attributes
-            if attr_name.lower() in EXCLUDE_ATTRIBUTES:
-                continue
-
-            # Skip internal attributes
-            if attr_name.startswith('_'):
-                continue
-            
+        # Entities of one type arrive with the same keys in the same order, so the
+        # exclusion and renaming of those keys is planned once per key layout.
+        # The plan is ordered by output key, so entity_dict is built already sorted
+        keys = tuple(currentAttributes)
+        plan = self._attributePlans.get(keys)
+        if plan is None:
+            plan = self._attributePlans[keys] = tuple(sorted(
+                ((attr_name, display_attr_name)
+                 for attr_name in keys
+                 if (display_attr_name := displayAttributeName(attr_name)) is not None),
+                key=itemgetter(1)
+            ))
+        
+        # Loop-invariant, read once per call rather than once per attribute
+        include_empty = INCLUDE_EMPTY_PROPERTIES
+        
+        for attr_name, display_attr_name in plan:
             attr_value = currentAttributes[attr_name]
                             
-            # Convert to JSON-serializable format using getAttributeValue
-            try:
-                json_value = self.getAttributeValueNew(attr_value)
-            except:
-                json_value = None
-            
-            # If this is GlobalId (converted to entityGuid), expand it to standard UUID format
-            if attr_name in EXPAND_GUID_ATTRIBUTES and json_value is not None:
-                json_value = expandGuid(json_value)
-
+            # Convert to JSON-serializable format; handles every attribute value type
+            json_value = self.getAttributeValueNew(attr_value)
             
             # If this is the type attribute being converted to componentType, append "Component"
             if attr_name == 'type' and json_value is not None:
                 json_value = json_value + 'Component'
             
-            # Print attribute name and type
-            attr_type = type(attr_value).__name__
-
-            # Apply substitution to attribute name if it exists in ATTRIBUTE_SUBSTITUTIONS
-            if attr_name in ATTRIBUTE_SUBSTITUTIONS:
-                display_attr_name = ATTRIBUTE_SUBSTITUTIONS[attr_name]
-            else:
-                display_attr_name = attr_name
-                            
-            # Convert to camelCase
-            display_attr_name = toLowerCamelcase(display_attr_name)
-            
             # Only add to dict if there's a value or if empty properties should be included
             # Skip if this key already exists in entity_dict (to avoid overwriting manually set values)
             if display_attr_name not in entity_dict:
                 if json_value is not None:
                     entity_dict[display_attr_name] = json_value
-                elif INCLUDE_EMPTY_PROPERTIES:
+                elif include_empty:
                     entity_dict[display_attr_name] = ""
         
-        # Generate deterministic GUID and place it as the first attribute
+        # Generate deterministic GUID for entities that have none
         if not 'componentGuid' in entity_dict and 'globalId' in entity_dict:
             # deterministic_guid = generateDeterministicGuid(
             #     self.modelName,
             #     entity_dict['componentType'],
             #     entity_dict['entityGuid']
             # )
-            # # Create new dict with componentGuid first, then all existing entries
-            ordered_dict = {'componentGuid': expandGuid(entity_dict['globalId']) }
-            ordered_dict.update(entity_dict)
-            entity_dict = ordered_dict
+            # Not in the plan, so re-sort to put it in place
+            entity_dict['componentGuid'] = expandGuid(entity_dict['globalId'])
+            entity_dict = dict(sorted(entity_dict.items()))
 
         return entity_dict
 
     def getAttributeValueNew(self, value):
         """Helper function to convert attribute values to JSON-serializable format"""
-        if value is None:
-            return None
-        elif isinstance(value, ifcopenshell.entity_instance):
-        #elif isinstance(value, ifcopenshell.entity_instance):
-            return self.processEntry(value)
-            # Check if this is an IfcObject that should be processed
-            # if value.is_a('IfcObject'):
-            #     return self.processEntry(value)
-            # else:
-            #     return self.createReferenceObject(value.__dict__, self.COMPACT)
-        elif isinstance(value, tuple):
-            return tuple(self.getAttributeValueNew(v) for v in value)
-        else:
+        # Entity references and aggregates are converted, everything else
+        # (None and scalars) is returned as-is
+        convert = self._valueConverters.get(value.__class__)
+        return value if convert is None else convert(value)
+
+    def getAggregateValue(self, value):
+        """Convert each item of an aggregate attribute value
+
+        Returns:
+        tuple | list: The aggregate itself when its items need no conversion,
+        otherwise a list of converted items (serializes the same as a tuple)
+        """
+        # Aggregates are homogeneous, so one that does not start with an entity
+        # reference or a nested aggregate holds only scalars (coordinates,
+        # ratios, labels) and is already JSON-serializable
+        if not value or value[0].__class__ not in self._valueConverters:
             return value
+        getAttributeValue = self.getAttributeValueNew
+        return [getAttributeValue(v) for v in value]
         
+    def buildObjCache(self):
+        """Generate OBJ meshes for every product in one geometry iterator run
+
+        The iterator tessellates on GEOMETRY_THREADS C++ threads, so meshes are
+        built in parallel instead of one create_shape call at a time.
+
+        Returns:
+        dict: OBJ string by GlobalId
+        """
+        objCache = {}
+        try:
+            iterator = ifcopenshell.geom.iterator(self.settings, self.ifcModel, GEOMETRY_THREADS)
+            if iterator.initialize():
+                while True:
+                    shape = iterator.get()
+                    obj = self.geometryToObj(shape.geometry)
+                    if obj:
+                        objCache[shape.guid] = obj
+                    if not iterator.next():
+                        break
+        except Exception as e:
+            # toObj falls back to create_shape for anything missing
+            print(str(e) + ': Geometry iterator failed, generating OBJ data per entity',
+                  file=sys.stderr)
+        return objCache
+
+    def geometryToObj(self, geometry):
+        """Format triangulated geometry as an OBJ string
+
+        parameters:
+        geometry: ifcopenshell triangulation with flat verts and faces
+
+        Returns:
+        string: OBJ string, or None if the geometry has no mesh data
+        """
+        # Check if geometry has verts and faces attributes
+        if not hasattr(geometry, 'verts') or not hasattr(geometry, 'faces'):
+            return None
+
+        # One formatted line per vertex/face straight from the flat
+        # buffers; zipping one iterator three times walks them in triples
+        verts = iter(geometry.verts)
+        vertString = ''.join([f'v {x} {y} {z}\n' for x, y, z in zip(verts, verts, verts)])
+
+        faces = iter(geometry.faces)
+        faceString = ''.join([f'f {a + 1} {b + 1} {c + 1}\n' for a, b, c in zip(faces, faces, faces)])
+
+        return vertString + faceString
+
     def toObj(self, entity):
         """Convert IfcProduct to OBJ mesh
 
@@ -310,31 +476,48 @@ class IFC2JSONSimple:
         """
 
         if entity.Representation:
+            if self._objCache is None:
+                self._objCache = self.buildObjCache()
+            obj = self._objCache.get(entity.GlobalId)
+            if obj is not None:
+                return obj
+
+            # Products the iterator skipped or failed on
             try:
                 shape = ifcopenshell.geom.create_shape(self.settings, entity)
+                return self.geometryToObj(shape.geometry)
+            except Exception as e:
+                print(str(e) + ': Unable to generate OBJ data for ' +
+                      str(entity), file=sys.stderr)
+                return None
 
-                # Check if geometry has verts and faces attributes
-                if not hasattr(shape.geometry, 'verts') or not hasattr(shape.geometry, 'faces'):
-                    return None
 
-                verts = shape.geometry.verts
-                vertsList = [' '.join(map(str, verts[x:x+3]))
-                             for x in range(0, len(verts), 3)]
-                vertString = 'v ' + '\nv '.join(vertsList) + '\n'
 
-                faces = shape.geometry.faces
-                facesList = [' '.join(map(str, [f + 1 for f in faces[x:x+3]]))
-                             for x in range(0, len(faces), 3)]
-                faceString = 'f ' + '\nf '.join(map(str, facesList)) + '\n'
 
-                return vertString + faceString
-            except Exception as e:
-                print(str(e) + ': Unable to generate OBJ data for ' +
-                      str(entity))
-                return None
 
+def writeJsonArray(objects, f, compact=False):
+    """Stream objects to a file as a JSON array
 
+    Parameters:
+    objects (iterable): JSON-serializable objects
+    f: Binary file to write to
+    compact (boolean): if True then objects are written without indentation
 
+    Returns:
+    int: Number of objects written
+    """
+    option = 0 if compact else orjson.OPT_INDENT_2
+    separator = b',' if compact else b',\n'
+    count = 0
+    f.write(b'[')
+    for count, obj in enumerate(objects, 1):
+        if count > 1:
+            f.write(separator)
+        elif not compact:
+            f.write(b'\n')
+        f.write(orjson.dumps(obj, option=option, default=str))
+    f.write(b'\n]' if count and not compact else b']')
+    return count
 
 
 def main():
@@ -375,20 +558,14 @@ Examples:
             EMPTY_PROPERTIES=args.empty_properties
         )
         
-        # Convert to JSON
-        json_objects = converter.spf2Json()
-        
-        # Prepare output
-        output_data = json_objects
-        
-        # Output results
+        # Convert and write one entity at a time, no full list or string in memory
         if args.output:
-            with open(args.output, 'w') as f:
-                json.dump(output_data, f, indent=2, default=str)
-            print(f"Successfully wrote {len(json_objects)} entities to {args.output}")
+            with open(args.output, 'wb') as f:
+                count = writeJsonArray(converter.iterSpf2Json(), f)
+            print(f"Successfully wrote {count} entities to {args.output}")
         else:
-            json_output = json.dumps(output_data, indent=2, default=str)
-            print(json_output)
+            writeJsonArray(converter.iterSpf2Json(), sys.stdout.buffer)
+            sys.stdout.buffer.write(b'\n')
             
     except FileNotFoundError as e:
         print(f"Error: {e}", file=sys.stderr)
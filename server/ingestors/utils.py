@@ -1,5 +1,6 @@
 import uuid
 import hashlib
+from functools import lru_cache
 
 try:
     import ifcopenshell.guid as guid
@@ -7,10 +8,14 @@ except ImportError:
     guid = None
 
 
+@lru_cache(maxsize=None)
 def toLowerCamelcase(string):
-    """Convert string from upper to lower camelCase"""
-    return string[0].lower() + string[1:]
+    """Convert string from upper to lower camelCase (memoized, keys repeat per entity)"""
+    return string[:1].lower() + string[1:]
 
+# Referenced entities expand the same GlobalId many times; bounded so a
+# long-running server does not keep every GUID it has ever seen
+@lru_cache(maxsize=1 << 16)
 def expandGuid(entityGuid):
     if guid is None:
         raise RuntimeError("ifcopenshell not available - cannot expand GUID")
@@ -31,15 +36,6 @@ def generateDeterministicGuid(modelName, componentType, entityGuid):
     """
     # Create a hash from the combination of modelName, componentType and entityGuid
     hash_input = f"{modelName}:{componentType}:{entityGuid}".encode('utf-8')
-    hash_obj = hashlib.sha256(hash_input)
-    hash_hex = hash_obj.hexdigest()
     
-    # Create a UUID from the hash (using namespace and name approach)
-    guid_obj = uuid.UUID(bytes=hash_obj.digest()[:16])
-    guid_str = str(guid_obj)
-    
-    # Format as the required format (removing dashes and re-adding in specific positions)
-    guid_clean = guid_str.replace('-', '')
-    formatted_guid = f"{guid_clean[0:8]}-{guid_clean[8:12]}-{guid_clean[12:16]}-{guid_clean[16:20]}-{guid_clean[20:32]}"
-    
-    return formatted_guid
\ No newline at end of file
+    # str(UUID) already uses the dashed 8-4-4-4-12 layout
+    return str(uuid.UUID(bytes=hashlib.sha256(hash_input).digest()[:16]))
@@ -4,11 +4,19 @@ import os
 import sys
 import json
 import argparse
+import threading
+import functools
+import hashlib
+import orjson
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
+from werkzeug.exceptions import HTTPException
 
 # Add ingestors to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'ingestors'))
@@ -19,6 +27,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'utils', 'ifc_utils')
 # Debug logging to file
 DEBUG_LOG = None
 
+# Total size of the encoded query responses remembered per server (see _cached_query_response)
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Longest query parameter whose parsed form is memoized (see csv_param)
+CSV_CACHE_MAX_LENGTH = 4096
+
+# Seconds browsers may reuse the admin/viewer pages before revalidating them
+PAGE_MAX_AGE = 300
+
 def debug_print(msg):
     """Print to both stdout and debug log file"""
     global DEBUG_LOG
@@ -33,6 +50,110 @@ def debug_print(msg):
 from ifc4ingestor import IFC2JSONSimple
 
 
+def csv_param(name):
+    """Parse a comma-separated query parameter into a tuple of stripped values
+
+    Returns None when the parameter is absent or empty. Values are interned so
+    repeated type names compare by identity in the memory tree indexes.
+    """
+    value = request.args.get(name, '')
+    # Long GUID lists are rarely repeated and would bloat the cache
+    if len(value) > CSV_CACHE_MAX_LENGTH:
+        return _parse_csv.__wrapped__(value) or None
+    return _parse_csv(value) or None
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_csv(value):
+    """Split a comma-separated string; memoized as clients repeat the same queries"""
+    return tuple(sys.intern(t) for t in (p.strip() for p in value.split(',')) if t)
+
+
+def json_response(obj, status=200):
+    """Serialize a response body with orjson instead of Flask's stdlib-based jsonify"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson
+
+    jsonify(), app.json.response() and request.get_json() encode and decode
+    with orjson instead of the stdlib json module. Keys are sorted and debug
+    responses indented as with the default provider.
+    """
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options(bool(kwargs.get('indent')))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class APIError(Exception):
+    """Client error raised by an endpoint and rendered as {'error': message}"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def stream_components_by_model(pairs, chunk_size=64 * 1024):
+    """Encode (model_name, component) pairs as a JSON object of per-model arrays
+
+    Pairs must arrive grouped by model. Output is yielded in chunks of roughly
+    chunk_size bytes so the full response is never held in memory.
+    """
+    buf = bytearray(b'{')
+    current = None
+    for model_name, component in pairs:
+        if model_name != current:
+            if current is not None:
+                buf += b'],'
+            buf += orjson.dumps(model_name)
+            buf += b':['
+            current = model_name
+        else:
+            buf += b','
+        buf += orjson.dumps(component)
+        if len(buf) >= chunk_size:
+            yield bytes(buf)
+            buf.clear()
+    buf += b']}' if current is not None else b'}'
+    yield bytes(buf)
+
+
+def stream_components_ndjson(pairs, chunk_size=64 * 1024):
+    """Encode (model_name, component) pairs as newline-delimited JSON
+
+    Each line is {"model": ..., "component": ...}, so clients can handle
+    components as they arrive. Output is yielded in chunks of roughly
+    chunk_size bytes.
+    """
+    buf = bytearray()
+    for model_name, component in pairs:
+        buf += orjson.dumps({'model': model_name, 'component': component})
+        buf += b'\n'
+        if len(buf) >= chunk_size:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
 class IFCProcessingServer:
     """Core IFC Processing Server with pluggable data store backends"""
     
@@ -48,6 +169,20 @@ class IFCProcessingServer:
         self.memory_tree = None
         self._descendants_exporter = None
         
+        # Serializes writes to the store together with the tree refresh that
+        # follows them; requests are served on multiple threads
+        self._store_lock = threading.Lock()
+        
+        # Store generation seen by the last tree refresh; other worker
+        # processes writing to the store bump it (see _sync_memory_tree)
+        self._store_generation = None
+        
+        # (view name, parsed parameters) -> (memory tree version, encoded body),
+        # least recently used first
+        self._response_cache = OrderedDict()
+        self._response_cache_bytes = 0
+        self._response_cache_lock = threading.Lock()
+        
         # Configure Flask app
         self._configure_app()
         
@@ -59,12 +194,23 @@ class IFCProcessingServer:
     
     def _configure_app(self):
         """Configure Flask application"""
+        # Encode jsonify() responses with orjson
+        self.app.json = OrjsonProvider(self.app)
+        
         # Enable CORS for all routes
         CORS(self.app)
         
+        # Compress JSON responses (component payloads repeat the same keys
+        # over and over and shrink 5-10x); tiny responses are left alone
+        self.app.config['COMPRESS_MIN_SIZE'] = 4096
+        self.app.config['COMPRESS_LEVEL'] = 4
+        self.app.config['COMPRESS_BR_LEVEL'] = 4
+        self.app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+        Compress(self.app)
+        
         # Configuration
         UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
-        ALLOWED_EXTENSIONS = {'ifc', 'json'}
+        ALLOWED_EXTENSIONS = frozenset({'ifc', 'json'})
         MAX_CONTENT_LENGTH = 500 * 1024 * 1024  # 500MB max file size
         
         self.app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -77,6 +223,7 @@ class IFCProcessingServer:
         
         # Store config for use in route handlers
         self.upload_folder = UPLOAD_FOLDER
+        self.upload_path = Path(UPLOAD_FOLDER)
         self.allowed_extensions = ALLOWED_EXTENSIONS
     
     def _initialize_backend(self):
@@ -92,6 +239,9 @@ class IFCProcessingServer:
             self._refresh_memory_tree()
             print(f"[OK] Initialized file-based data store at: {self.file_store.base_path}")
             
+            # Pick up models stored or deleted by other worker processes
+            self.app.before_request(self._sync_memory_tree)
+            
         elif self.data_store_type == 'mongodbBased':
             from mongodbBased import MongoDBStore
             from mongodbMemoryTree import MongoDBMemoryTree
@@ -103,11 +253,17 @@ class IFCProcessingServer:
         else:
             raise ValueError(f"Unknown data store type: {self.data_store_type}")
     
-    def _refresh_memory_tree(self):
-        """Refresh the in-memory component tree"""
+    def _refresh_memory_tree(self, force=False):
+        """Refresh the in-memory component tree
+        
+        Args:
+            force: Re-read every model, not only those changed since the last refresh
+        """
         try:
             if self.data_store_type == 'fileBased':
-                self.memory_tree.refresh_from_store(self.file_store.base_path)
+                # Taken before reading so changes made during the refresh trigger another one
+                self._store_generation = self.file_store.generation()
+                self.memory_tree.refresh_from_store(self.file_store.base_path, force=force)
                 models = self.memory_tree.get_models()
                 print(f"✅ Memory tree refreshed: {len(models)} model(s) loaded")
                 return len(models)
@@ -118,6 +274,23 @@ class IFCProcessingServer:
             print(f"❌ Error refreshing memory tree: {e}")
             return 0
 
+    def _sync_memory_tree(self):
+        """Refresh the tree if the store changed since the last refresh
+        
+        Each Gunicorn worker holds its own memory tree, so a model uploaded
+        through one worker is otherwise invisible to the others. Costs reading
+        the store's small generation file per request when nothing changed.
+        """
+        if self.file_store.generation() == self._store_generation:
+            return
+        # A write in progress in this process refreshes the tree itself
+        if not self._store_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh_memory_tree()
+        finally:
+            self._store_lock.release()
+
     def _expand_entity_types_for_models(self, entity_types, models):
         """Expand entity types to include all descendants, filtered by model."""
         if not entity_types:
@@ -126,6 +299,19 @@ class IFCProcessingServer:
         print(f"[EXPAND] Input: entity_types={entity_types}, models={models}")
         
         search_models = models if models else self.memory_tree.get_models()
+        descendants = self._entity_type_descendants(entity_types)
+        
+        per_model = {}
+        for model_name in search_models:
+            model_types = set(self.memory_tree.get_entity_types(models=[model_name]))
+            intersection = model_types.intersection(descendants)
+            per_model[model_name] = sorted(list(intersection))
+            print(f"[EXPAND] Model {model_name}: available={len(model_types)}, intersection={per_model[model_name]}")
+
+        return per_model
+
+    def _entity_type_descendants(self, entity_types):
+        """Expand entity types to the set of themselves and all their descendants."""
         descendants = set()
 
         try:
@@ -155,15 +341,7 @@ class IFCProcessingServer:
             descendants = set(entity_types)
 
         print(f"[EXPAND] Final descendants: {descendants}")
-        
-        per_model = {}
-        for model_name in search_models:
-            model_types = set(self.memory_tree.get_entity_types(models=[model_name]))
-            intersection = model_types.intersection(descendants)
-            per_model[model_name] = sorted(list(intersection))
-            print(f"[EXPAND] Model {model_name}: available={len(model_types)}, intersection={per_model[model_name]}")
-
-        return per_model
+        return descendants
     
     def _expand_component_types_for_models(self, component_types, models):
         """Expand component types to include all descendants, filtered by model.
@@ -194,19 +372,14 @@ class IFCProcessingServer:
                 descendants = set()
                 for comp_type in component_types:
                     # Strip "Component" suffix if present
-                    if comp_type.endswith('Component'):
-                        descendants.add(comp_type[:-9])
-                    else:
-                        descendants.add(comp_type)
+                    descendants.add(comp_type.removesuffix('Component'))
                 print(f"   ⚠️  Exporter unavailable, using fallback: {descendants}")
                 raise RuntimeError("Descendants exporter unavailable")
 
             # Get descendants for each component type
             for comp_type in component_types:
                 # Strip "Component" suffix if present to get the entity type name
-                entity_type = comp_type
-                if entity_type.endswith('Component'):
-                    entity_type = entity_type[:-9]
+                entity_type = comp_type.removesuffix('Component')
                 
                 print(f"   Processing component type '{comp_type}' → entity type '{entity_type}'")
                 
@@ -219,20 +392,14 @@ class IFCProcessingServer:
             # Fallback: strip Component suffix and use as-is
             descendants = set()
             for comp_type in component_types:
-                if comp_type.endswith('Component'):
-                    descendants.add(comp_type[:-9])
-                else:
-                    descendants.add(comp_type)
+                descendants.add(comp_type.removesuffix('Component'))
             print(f"   Using fallback descendants: {descendants}")
 
         if not descendants:
             # Fallback: just strip Component and use as-is
             descendants = set()
             for comp_type in component_types:
-                if comp_type.endswith('Component'):
-                    descendants.add(comp_type[:-9])
-                else:
-                    descendants.add(comp_type)
+                descendants.add(comp_type.removesuffix('Component'))
             print(f"   Descendants was empty, using fallback: {descendants}")
 
         print(f"   Final descendants to search: {descendants}")
@@ -246,126 +413,217 @@ class IFCProcessingServer:
 
         return per_model
     
+    def _store_model(self, filename, json_objects):
+        """Store a converted model, replacing any previous version, and refresh the tree
+        
+        json_objects may be a generator converting the model as it is consumed;
+        that runs without the store lock, so uploads do not wait on each other's
+        conversions. The lock is taken only to bring the tree up to date. The
+        file-based store swaps the new shard in over the previous version, which
+        is kept if the components cannot be produced.
+        """
+        result = self.file_store.store(filename, json_objects)
+        
+        with self._store_lock:
+            if self.data_store_type != 'fileBased':
+                self._refresh_memory_tree()
+            elif self._store_generation == result['generation']:
+                # Another request already refreshed the tree after the swap
+                pass
+            elif self._store_generation == result['previous_generation']:
+                # Nothing else changed the store since the last refresh, so
+                # load just the stored model instead of rescanning the store
+                self.memory_tree.insert_model(result['directory'], result['path'])
+                self._store_generation = result['generation']
+            else:
+                self._refresh_memory_tree()
+        return result
+    
+    def _cached_query_response(self, *params):
+        """Decorate a GET view so its JSON result is encoded once per memory tree version
+        
+        The wrapped view returns a JSON-serializable result rather than a
+        response. Results depend only on the named comma-separated query
+        parameters and the loaded models, so repeated queries are answered with
+        the cached bytes until the tree changes. Other query arguments (such as
+        cache-busting ones) do not create new entries.
+        
+        Args:
+            params: Names of the query parameters the view reads with csv_param
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper():
+                # Only the file-based tree tracks a version
+                if self.data_store_type != 'fileBased':
+                    return json_response(view())
+                
+                version = self.memory_tree.version
+                key = (view.__name__, *map(csv_param, params))
+                with self._response_cache_lock:
+                    cached = self._response_cache.get(key)
+                    if cached is not None and cached[0] == version:
+                        self._response_cache.move_to_end(key)
+                        return Response(cached[1], mimetype='application/json')
+                
+                body = orjson.dumps(view())
+                with self._response_cache_lock:
+                    self._evict_response(key)
+                    if len(body) <= RESPONSE_CACHE_MAX_BYTES:
+                        self._response_cache[key] = (version, body)
+                        self._response_cache_bytes += len(body)
+                        while self._response_cache_bytes > RESPONSE_CACHE_MAX_BYTES:
+                            self._evict_response(next(iter(self._response_cache)))
+                return Response(body, mimetype='application/json')
+            
+            return wrapper
+        
+        return decorator
+    
+    def _evict_response(self, key):
+        """Drop a query response from the response cache (caller holds the lock)"""
+        cached = self._response_cache.pop(key, None)
+        if cached is not None:
+            self._response_cache_bytes -= len(cached[1])
+    
+    def _static_page(self, template_name):
+        """Render a template once and return a view serving it with an ETag
+        
+        The admin and viewer templates use no Jinja variables, so their output
+        never changes while the server runs. Browsers revalidating a cached
+        copy get a 304 without a body.
+        """
+        with self.app.app_context():
+            body = render_template(template_name).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        
+        def serve():
+            response = Response(body, mimetype='text/html')
+            response.set_etag(etag)
+            response.cache_control.public = True
+            response.cache_control.max_age = PAGE_MAX_AGE
+            return response.make_conditional(request)
+        
+        return serve
+    
     def _allowed_file(self, filename):
         """Check if file extension is allowed"""
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.app.config.get('ALLOWED_EXTENSIONS', [])
+        # A name without a dot has no extension (rpartition would return the whole name)
+        _, dot, extension = filename.rpartition('.')
+        return bool(dot) and extension.lower() in self.allowed_extensions
     
     def _register_routes(self):
         """Register all Flask routes"""
+        cached = self._cached_query_response
+        admin_page = self._static_page('admin.html')
+        viewer_page = self._static_page('viewer.html')
         
         @self.app.route('/')
         def admin():
             """Serve the admin page"""
-            return render_template('admin.html')
+            return admin_page()
         
         @self.app.route('/viewer')
         def viewer():
             """Serve the advanced viewer page"""
-            return render_template('viewer.html')
+            return viewer_page()
         
         @self.app.route('/api/upload', methods=['POST'])
         def upload_file():
             """Handle file upload and processing"""
-            try:
-                overwrite = request.args.get('overwrite', 'false').lower() in ('1', 'true', 'yes')
+            overwrite = request.args.get('overwrite', 'false').lower() in ('1', 'true', 'yes')
 
-                # Check if file is in request
-                if 'file' not in request.files:
-                    return jsonify({'error': 'No file provided'}), 400
-                
-                file = request.files['file']
+            # Check if file is in request
+            if 'file' not in request.files:
+                raise APIError('No file provided')
+            
+            file = request.files['file']
+            
+            if file.filename == '':
+                raise APIError('No file selected')
+            
+            if not self._allowed_file(file.filename):
+                raise APIError('File type not allowed. Use .ifc or .json')
+            
+            # Secure the filename
+            filename = secure_filename(file.filename)
+            file_path = Path(filename)
+            extension = file_path.suffix.lower()
+            
+            # The upload is parsed straight from the request stream (spooled to
+            # a temporary file by Werkzeug), never copied into the uploads folder
+            
+            # Process based on file type
+            if extension == '.ifc':
+                # Convert IFC to JSON using the ingestor
+                json_filename = file_path.with_suffix('.json').name
+                model_name = file_path.stem
+
+                if self.data_store_type == 'fileBased' and self.file_store.model_exists(model_name):
+                    if not overwrite:
+                        return jsonify({
+                            'error': 'Model already exists',
+                            'model_exists': True,
+                            'model': model_name
+                        }), 409
                 
-                if file.filename == '':
-                    return jsonify({'error': 'No file selected'}), 400
+                try:
+                    converter = IFC2JSONSimple.from_stream(file.stream)
+                except ValueError as e:
+                    raise APIError(str(e))
                 
-                if not self._allowed_file(file.filename):
-                    return jsonify({'error': 'File type not allowed. Use .ifc or .json'}), 400
+                # Keep the converted JSON in the uploads folder only when debugging
+                if os.environ.get('IFCX_DEBUG_DUMP') == '1':
+                    json_objects = converter.spf2Json()
+                    with open(self.upload_path / json_filename, 'w') as f:
+                        json.dump(json_objects, f, indent=2, default=str)
+                else:
+                    # Converted as the store consumes them, so the store's writer
+                    # thread flushes the shard while conversion continues and the
+                    # converted model is never held in memory as a whole
+                    json_objects = converter.iterSpf2Json()
                 
-                # Secure the filename
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(self.upload_folder, filename)
+                # Store in data store and refresh memory tree with new data
+                result = self._store_model(json_filename, json_objects)
+                count = result.get('count', 0)
                 
-                # Save the uploaded file
-                file.save(file_path)
+                return jsonify({
+                    'filename': json_filename,
+                    'entities_count': count,
+                    'stored_count': count,
+                    'store_path': result.get('path', ''),
+                    'message': f"Successfully processed {count} entities"
+                })
+            
+            elif extension == '.json':
+                # Load JSON and store
+                try:
+                    json_objects = orjson.loads(file.stream.read())
+                except orjson.JSONDecodeError as e:
+                    raise APIError(f'Invalid JSON file: {e}')
                 
-                # Process based on file type
-                if filename.lower().endswith('.ifc'):
-                    # Convert IFC to JSON using the ingestor
-                    json_filename = os.path.splitext(filename)[0] + '.json'
-                    json_path = os.path.join(self.upload_folder, json_filename)
-                    model_name = os.path.splitext(json_filename)[0]
-
-                    if self.data_store_type == 'fileBased' and self.file_store.model_exists(model_name):
-                        if not overwrite:
-                            return jsonify({
-                                'error': 'Model already exists',
-                                'model_exists': True,
-                                'model': model_name
-                            }), 409
-                        self.file_store.delete_model(model_name)
-                    
-                    converter = IFC2JSONSimple(file_path)
-                    json_objects = converter.spf2Json()
-                    
-                    # Save JSON temporarily
-                    with open(json_path, 'w') as f:
-                        json.dump(json_objects, f, indent=2, default=str)
-                    
-                    # Store in data store
-                    result = self.file_store.store(json_filename, json_objects)
-                    
-                    # Refresh memory tree with new data
-                    self._refresh_memory_tree()
-                    
-                    # Clean up uploads
-                    os.remove(file_path)
-                    os.remove(json_path)
-                    
-                    return jsonify({
-                        'filename': json_filename,
-                        'entities_count': len(json_objects),
-                        'stored_count': result.get('count', 0),
-                        'store_path': result.get('path', ''),
-                        'message': f"Successfully processed {len(json_objects)} entities"
-                    })
+                if not isinstance(json_objects, list):
+                    raise APIError('JSON file must contain an array of components')
+
+                model_name = file_path.stem
+                if self.data_store_type == 'fileBased' and self.file_store.model_exists(model_name):
+                    if not overwrite:
+                        return jsonify({
+                            'error': 'Model already exists',
+                            'model_exists': True,
+                            'model': model_name
+                        }), 409
                 
-                elif filename.lower().endswith('.json'):
-                    # Load JSON and store
-                    with open(file_path, 'r') as f:
-                        json_objects = json.load(f)
-                    
-                    if not isinstance(json_objects, list):
-                        return jsonify({'error': 'JSON file must contain an array of components'}), 400
-
-                    model_name = os.path.splitext(filename)[0]
-                    if self.data_store_type == 'fileBased' and self.file_store.model_exists(model_name):
-                        if not overwrite:
-                            return jsonify({
-                                'error': 'Model already exists',
-                                'model_exists': True,
-                                'model': model_name
-                            }), 409
-                        self.file_store.delete_model(model_name)
-                    
-                    # Store in data store
-                    result = self.file_store.store(filename, json_objects)
-                    
-                    # Refresh memory tree with new data
-                    self._refresh_memory_tree()
-                    
-                    # Clean up upload
-                    os.remove(file_path)
-                    
-                    return jsonify({
-                        'filename': filename,
-                        'entities_count': len(json_objects),
-                        'stored_count': result.get('count', 0),
-                        'store_path': result.get('path', ''),
-                        'message': f"Successfully stored {len(json_objects)} entities"
-                    })
+                # Store in data store and refresh memory tree with new data
+                result = self._store_model(filename, json_objects)
                 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+                return jsonify({
+                    'filename': filename,
+                    'entities_count': len(json_objects),
+                    'stored_count': result.get('count', 0),
+                    'store_path': result.get('path', ''),
+                    'message': f"Successfully stored {len(json_objects)} entities"
+                })
         
         @self.app.route('/api/status', methods=['GET'])
         def status():
@@ -394,6 +652,7 @@ class IFCProcessingServer:
             ])
         
         @self.app.route('/api/entityGuids', methods=['GET'])
+        @cached('models', 'entityTypes')
         def query_entity_guids():
             """Query for entity GUIDs
             
@@ -403,41 +662,28 @@ class IFCProcessingServer:
             
             Returns: Dictionary mapping model names to arrays of entity GUIDs
             """
-            try:
-                # Parse query parameters
-                models = request.args.get('models', '')
-                entity_types = request.args.get('entityTypes', '')
-                
-                models = [m.strip() for m in models.split(',')] if models else None
-                entity_types = [t.strip() for t in entity_types.split(',')] if entity_types else None
-                
-                # If no specific models requested, use all available models
-                if not models:
-                    models = self.memory_tree.get_models()
+            # Parse query parameters
+            models = csv_param('models')
+            entity_types = csv_param('entityTypes')
+            
+            # If no specific models requested, use all available models
+            if not models:
+                models = self.memory_tree.get_models()
 
-                expanded_types = self._expand_entity_types_for_models(entity_types, models) if entity_types else {}
+            # Expand entity types to their descendants; models holding none
+            # of them are left out of the result
+            if entity_types:
+                entity_types = sorted(self._entity_type_descendants(entity_types))
 
-                # Query and organize results by model
-                result_by_model = {}
-                for model_name in models:
-                    model_entity_types = None
-                    if entity_types:
-                        model_entity_types = expanded_types.get(model_name, [])
-                        if not model_entity_types and not entity_guids:
-                            continue
-
-                    entity_guids = self.memory_tree.get_entity_guids(
-                        models=[model_name],
-                        entity_types=model_entity_types
-                    )
-                    if entity_guids:
-                        result_by_model[model_name] = entity_guids
-                
-                return jsonify(result_by_model)
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+            result_by_model = self.memory_tree.get_entity_guids_by_model(
+                models=models,
+                entity_types=entity_types
+            )
+            
+            return result_by_model
         
         @self.app.route('/api/componentGuids', methods=['GET'])
+        @cached('models', 'entityGuids', 'entityTypes', 'componentTypes')
         def query_component_guids():
             """Query for component GUIDs
             
@@ -449,60 +695,43 @@ class IFCProcessingServer:
             
             Returns: Dictionary mapping model names to arrays of component GUIDs
             """
-            try:
-                # Parse query parameters
-                models = request.args.get('models', '')
-                entity_guids = request.args.get('entityGuids', '')
-                entity_types = request.args.get('entityTypes', '')
-                component_types = request.args.get('componentTypes', '')
-                
-                models = [m.strip() for m in models.split(',')] if models else None
-                entity_guids = [e.strip() for e in entity_guids.split(',')] if entity_guids else None
-                entity_types = [t.strip() for t in entity_types.split(',')] if entity_types else None
-                component_types = [t.strip() for t in component_types.split(',')] if component_types else None
-                
-                # If no specific models requested, use all available models
-                if not models:
-                    models = self.memory_tree.get_models()
-
-                # Expand component types if provided
-                if component_types:
-                    expanded_comp_types = self._expand_component_types_for_models(component_types, models)
-                    result_by_model = {}
-                    for model_name in models:
-                        model_comp_types = expanded_comp_types.get(model_name, [])
-                        if model_comp_types:
-                            component_guids = self.memory_tree.get_component_guids_by_type(
-                                component_types=model_comp_types,
-                                models=[model_name]
-                            )
-                            if component_guids:
-                                result_by_model[model_name] = component_guids
-                    return jsonify(result_by_model)
-                
-                # Otherwise expand entity types
-                expanded_types = self._expand_entity_types_for_models(entity_types, models) if entity_types else {}
+            # Parse query parameters
+            models = csv_param('models')
+            entity_guids = csv_param('entityGuids')
+            entity_types = csv_param('entityTypes')
+            component_types = csv_param('componentTypes')
+            
+            # If no specific models requested, use all available models
+            if not models:
+                models = self.memory_tree.get_models()
 
-                # Query and organize results by model
+            # Expand component types if provided
+            if component_types:
+                expanded_comp_types = self._expand_component_types_for_models(component_types, models)
                 result_by_model = {}
                 for model_name in models:
-                    model_entity_types = None
-                    if entity_types:
-                        model_entity_types = expanded_types.get(model_name, [])
-                        if not model_entity_types:
-                            continue
+                    model_comp_types = expanded_comp_types.get(model_name, [])
+                    if model_comp_types:
+                        component_guids = self.memory_tree.get_component_guids_by_type(
+                            component_types=model_comp_types,
+                            models=[model_name]
+                        )
+                        if component_guids:
+                            result_by_model[model_name] = component_guids
+                return result_by_model
+            
+            # Otherwise expand entity types to their descendants; models
+            # holding none of them are left out of the result
+            if entity_types:
+                entity_types = sorted(self._entity_type_descendants(entity_types))
 
-                    component_guids = self.memory_tree.get_component_guids(
-                        models=[model_name],
-                        entity_guids=entity_guids,
-                        entity_types=model_entity_types
-                    )
-                    if component_guids:
-                        result_by_model[model_name] = component_guids
-                
-                return jsonify(result_by_model)
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+            result_by_model = self.memory_tree.get_component_guids_by_model(
+                models=models,
+                entity_guids=entity_guids,
+                entity_types=entity_types
+            )
+            
+            return result_by_model
         
         @self.app.route('/api/components', methods=['GET'])
         def get_components():
@@ -514,137 +743,118 @@ class IFCProcessingServer:
             - entityTypes: comma-separated list of entity types (optional)
             - entityGuids: comma-separated list of entity GUIDs (optional)
             - componentTypes: comma-separated list of component types (optional)
+            - format: 'ndjson' for newline-delimited {model, component} records (optional)
             
             Returns: Dictionary mapping model names to arrays of component objects
             """
-            try:
+            with open('api_debug.log', 'a') as f:
+                f.write(f"\n[GET_COMPONENTS] New request\n")
+            
+            # Parse query parameters
+            component_guids = csv_param('componentGuids')
+            models = csv_param('models')
+            entity_types = csv_param('entityTypes')
+            entity_guids = csv_param('entityGuids')
+            component_types = csv_param('componentTypes')
+            
+            with open('api_debug.log', 'a') as f:
+                f.write(f"  models={models}\n")
+                f.write(f"  entity_types={entity_types}\n")
+                f.write(f"  entity_guids={entity_guids}\n")
+                f.write(f"  component_types={component_types}\n")
+            
+            # If specific component GUIDs provided, use those directly
+            if component_guids:
                 with open('api_debug.log', 'a') as f:
-                    f.write(f"\n[GET_COMPONENTS] New request\n")
-                
-                # Parse query parameters
-                component_guids_param = request.args.get('componentGuids', '')
-                models = request.args.get('models', '')
-                entity_types = request.args.get('entityTypes', '')
-                entity_guids = request.args.get('entityGuids', '')
-                component_types = request.args.get('componentTypes', '')
-                
-                # Parse into lists
-                component_guids = [g.strip() for g in component_guids_param.split(',')] if component_guids_param else None
-                models = [m.strip() for m in models.split(',')] if models else None
-                entity_types = [t.strip() for t in entity_types.split(',')] if entity_types else None
-                entity_guids = [g.strip() for g in entity_guids.split(',')] if entity_guids else None
-                component_types = [t.strip() for t in component_types.split(',')] if component_types else None
-                
+                    f.write(f"  -> Branch 1: component_guids\n")
+                pairs = self.memory_tree.iter_components(component_guids, readonly=True)
+            # If component types provided, use those
+            elif component_types:
                 with open('api_debug.log', 'a') as f:
-                    f.write(f"  models={models}\n")
-                    f.write(f"  entity_types={entity_types}\n")
-                    f.write(f"  entity_guids={entity_guids}\n")
-                    f.write(f"  component_types={component_types}\n")
+                    f.write(f"  -> Branch 2: component_types\n")
+                search_models = models if models else self.memory_tree.get_models()
+                expanded_comp_types = self._expand_component_types_for_models(component_types, search_models)
                 
-                # If specific component GUIDs provided, use those directly
-                if component_guids:
-                    with open('api_debug.log', 'a') as f:
-                        f.write(f"  -> Branch 1: component_guids\n")
-                    components, guid_to_model = self.memory_tree.get_components(component_guids)
-                # If component types provided, use those
-                elif component_types:
-                    with open('api_debug.log', 'a') as f:
-                        f.write(f"  -> Branch 2: component_types\n")
-                    search_models = models if models else self.memory_tree.get_models()
-                    expanded_comp_types = self._expand_component_types_for_models(component_types, search_models)
-                    
-                    found_guids = set()
-                    for model_name in search_models:
-                        model_comp_types = expanded_comp_types.get(model_name, [])
-                        if model_comp_types:
-                            model_guids = self.memory_tree.get_component_guids_by_type(
-                                component_types=model_comp_types,
-                                models=[model_name]
-                            )
-                            found_guids.update(model_guids)
-                    
-                    components, guid_to_model = self.memory_tree.get_components(list(found_guids), models=search_models)
-                # Otherwise, use query filters to find components
-                elif models or entity_types or entity_guids:
-                    with open('api_debug.log', 'a') as f:
-                        f.write(f"  -> Branch 3: query filters (models OR entity_types OR entity_guids)\n")
-                    search_models = models if models else self.memory_tree.get_models()
-                    with open('api_debug.log', 'a') as f:
-                        f.write(f"     search_models={search_models}\n")
-                        f.write(f"     Calling _expand_entity_types_for_models({entity_types}, {search_models})\n")
-                    expanded_types = self._expand_entity_types_for_models(entity_types, search_models) if entity_types else {}
-                    with open('api_debug.log', 'a') as f:
-                        f.write(f"     expanded_types={expanded_types}\n")
-
-                    found_guids = set()
-                    for model_name in search_models:
-                        model_entity_types = None
-                        if entity_types:
-                            model_entity_types = expanded_types.get(model_name, [])
-                            if not model_entity_types and not entity_guids:
-                                continue
-
-                        with open('api_debug.log', 'a') as f:
-                            f.write(f"     Model {model_name}: calling get_component_guids with entity_types={model_entity_types}\n")
-                        
-                        model_guids = self.memory_tree.get_component_guids(
-                            models=[model_name],
-                            entity_types=model_entity_types,
-                            entity_guids=entity_guids
+                found_guids = set()
+                for model_name in search_models:
+                    model_comp_types = expanded_comp_types.get(model_name, [])
+                    if model_comp_types:
+                        model_guids = self.memory_tree.get_component_guids_by_type(
+                            component_types=model_comp_types,
+                            models=[model_name]
                         )
-                        with open('api_debug.log', 'a') as f:
-                            f.write(f"     Model {model_name}: found {len(model_guids)} guids\n")
                         found_guids.update(model_guids)
-
-                    # Get components, restricting search to the filtered models
-                    components, guid_to_model = self.memory_tree.get_components(list(found_guids), models=search_models)
-                else:
-                    # No filters specified - return all components from all models
-                    all_guids = self.memory_tree.get_component_guids()
-                    components, guid_to_model = self.memory_tree.get_components(all_guids)
                 
+                pairs = self.memory_tree.iter_components(list(found_guids), models=search_models, readonly=True)
+            # Otherwise, use query filters to find components
+            elif models or entity_types or entity_guids:
                 with open('api_debug.log', 'a') as f:
-                    f.write(f"  Found {len(components)} total components\n")
-                
-                # Organize components by model using the guid_to_model mapping
-                result_by_model = {}
-                for component in components:
-                    guid = component.get('componentGuid', '')
-                    model_name = guid_to_model.get(guid, 'unknown')
-                    if model_name not in result_by_model:
-                        result_by_model[model_name] = []
-                    result_by_model[model_name].append(component)
-                
+                    f.write(f"  -> Branch 3: query filters (models OR entity_types OR entity_guids)\n")
+                search_models = models if models else self.memory_tree.get_models()
                 with open('api_debug.log', 'a') as f:
-                    f.write(f"  Returning {len(result_by_model)} models\n")
-                
-                return jsonify(result_by_model)
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+                    f.write(f"     search_models={search_models}\n")
+                    f.write(f"     Calling _expand_entity_types_for_models({entity_types}, {search_models})\n")
+                expanded_types = self._expand_entity_types_for_models(entity_types, search_models) if entity_types else {}
+                with open('api_debug.log', 'a') as f:
+                    f.write(f"     expanded_types={expanded_types}\n")
+
+                found_guids = set()
+                for model_name in search_models:
+                    model_entity_types = None
+                    if entity_types:
+                        model_entity_types = expanded_types.get(model_name, [])
+                        if not model_entity_types and not entity_guids:
+                            continue
+
+                    with open('api_debug.log', 'a') as f:
+                        f.write(f"     Model {model_name}: calling get_component_guids with entity_types={model_entity_types}\n")
+                    
+                    model_guids = self.memory_tree.get_component_guids(
+                        models=[model_name],
+                        entity_types=model_entity_types,
+                        entity_guids=entity_guids
+                    )
+                    with open('api_debug.log', 'a') as f:
+                        f.write(f"     Model {model_name}: found {len(model_guids)} guids\n")
+                    found_guids.update(model_guids)
+
+                # Get components, restricting search to the filtered models
+                pairs = self.memory_tree.iter_components(list(found_guids), models=search_models, readonly=True)
+            else:
+                # No filters specified - return all components from all models
+                all_guids = self.memory_tree.get_component_guids()
+                pairs = self.memory_tree.iter_components(all_guids, readonly=True)
+            
+            # Stream the components as they are encoded, one record per line
+            # with ?format=ndjson, otherwise grouped into per-model arrays
+            if request.args.get('format') == 'ndjson':
+                return Response(stream_components_ndjson(pairs), mimetype='application/x-ndjson')
+            return Response(stream_components_by_model(pairs), mimetype='application/json')
         
         @self.app.route('/api/refresh', methods=['POST'])
         def refresh_memory():
-            """Manually refresh the in-memory tree"""
-            try:
-                count = self._refresh_memory_tree()
-                return jsonify({
-                    'models_loaded': count,
-                    'message': f'Memory tree refreshed with {count} model(s)'
-                })
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            """Manually refresh the in-memory tree
+            
+            Query params:
+                force: '1' to re-read all models instead of only changed ones
+            """
+            count = self._refresh_memory_tree(force=request.args.get('force') == '1')
+            return jsonify({
+                'models_loaded': count,
+                'message': f'Memory tree refreshed with {count} model(s)'
+            })
         
         @self.app.route('/api/models', methods=['GET'])
+        @cached()
         def list_models():
             """List all loaded models"""
-            models = self.memory_tree.get_models()
-            return jsonify(models)
+            return self.memory_tree.get_models()
 
         @self.app.route('/api/models/details', methods=['GET'])
         def list_models_details():
             """List all stored models with metadata (file-based only)"""
             if self.data_store_type != 'fileBased':
-                return jsonify({'error': 'Model details are only available for fileBased store'}), 501
+                raise APIError('Model details are only available for fileBased store', status=501)
 
             return jsonify(self.file_store.list_directories())
 
@@ -652,7 +862,7 @@ class IFCProcessingServer:
         def delete_models():
             """Delete one or more models and refresh the memory tree"""
             if self.data_store_type != 'fileBased':
-                return jsonify({'error': 'Delete is only available for fileBased store'}), 501
+                raise APIError('Delete is only available for fileBased store', status=501)
 
             payload = request.get_json(silent=True) or {}
             models = payload.get('models') or []
@@ -660,21 +870,22 @@ class IFCProcessingServer:
                 models = [payload.get('model')]
 
             if not models:
-                return jsonify({'error': 'No models provided'}), 400
+                raise APIError('No models provided')
 
             deleted = []
             missing = []
-            for model_name in models:
-                try:
-                    if self.file_store.delete_model(model_name):
-                        deleted.append(model_name)
-                    else:
+            with self._store_lock:
+                for model_name in models:
+                    try:
+                        if self.file_store.delete_model(model_name):
+                            deleted.append(model_name)
+                        else:
+                            missing.append(model_name)
+                    except ValueError:
                         missing.append(model_name)
-                except ValueError:
-                    missing.append(model_name)
 
-            if deleted:
-                self._refresh_memory_tree()
+                if deleted:
+                    self._refresh_memory_tree()
 
             return jsonify({
                 'deleted': deleted,
@@ -683,6 +894,7 @@ class IFCProcessingServer:
             })
         
         @self.app.route('/api/entityTypes', methods=['GET'])
+        @cached('models')
         def list_entity_types():
             """List all entity types in specified models
             
@@ -691,17 +903,12 @@ class IFCProcessingServer:
             
             Returns: List of entity types
             """
-            try:
-                models = request.args.get('models', '')
-                models = [m.strip() for m in models.split(',')] if models else None
-                
-                types = self.memory_tree.get_entity_types(models=models)
-                
-                return jsonify(types)
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+            models = csv_param('models')
+            
+            return self.memory_tree.get_entity_types(models=models)
         
         @self.app.route('/api/componentTypes', methods=['GET'])
+        @cached('models')
         def list_component_types():
             """List all component types in specified models
             
@@ -710,25 +917,34 @@ class IFCProcessingServer:
             
             Returns: List of component types
             """
-            try:
-                models = request.args.get('models', '')
-                models = [m.strip() for m in models.split(',')] if models else None
-                
-                types = self.memory_tree.get_component_types(models=models)
-                
-                return jsonify(types)
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+            models = csv_param('models')
+            
+            return self.memory_tree.get_component_types(models=models)
         
         @self.app.errorhandler(413)
         def too_large(e):
             """Handle file too large error"""
             return jsonify({'error': 'File is too large. Maximum size is 500MB'}), 413
+        
+        @self.app.errorhandler(APIError)
+        def api_error(e):
+            """Render client errors raised by the endpoints"""
+            return json_response({'error': str(e)}, status=e.status)
+        
+        @self.app.errorhandler(Exception)
+        def unexpected_error(e):
+            """Render any other failure as a JSON 500, leaving HTTP errors (404, 405, ...) as they are"""
+            if isinstance(e, HTTPException):
+                return e
+            print(f"❌ Error handling {request.method} {request.path}: {e}")
+            return json_response({'error': str(e)}, status=500)
 
 
 def create_app(data_store_type='fileBased'):
     """Factory function to create and configure the Flask app
     
+    Used by wsgi.py to serve the app under Gunicorn in production.
+    
     Args:
         data_store_type: 'fileBased' or 'mongodbBased'
     
@@ -816,7 +1032,7 @@ Examples:
     print("="*50 + "\n")
     
     try:
-        server.app.run(debug=args.debug, host=args.host, port=args.port)
+        server.app.run(debug=args.debug, host=args.host, port=args.port, threaded=True)
     except KeyboardInterrupt:
         print("\n\n✅ Server stopped")
         sys.exit(0)
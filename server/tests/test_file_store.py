@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Unit tests for FileBasedStore against a temporary directory
+
+Run from the server directory: python -m unittest tests.test_file_store
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dataStores', 'fileBased'))
+
+import fileBased
+from fileBased import FileBasedStore, read_components, read_shard
+from tests.test_memory_tree import make_components
+
+
+class FileBasedStoreTestCase(unittest.TestCase):
+    """Store in a temporary directory"""
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_path)
+        self.store = FileBasedStore(self.base_path)
+        self.model_path = os.path.join(self.base_path, 'modelA')
+
+
+class RetrieveTest(FileBasedStoreTestCase):
+
+    def test_results_are_independent(self):
+        self.store.store('modelA.ifc', make_components('a'))
+        self.store.retrieve('modelA')[0]['componentGuid'] = 'changed'
+        self.assertEqual(self.store.retrieve('modelA'), make_components('a'))
+
+    def test_missing_model(self):
+        self.assertEqual(self.store.retrieve('missing'), [])
+
+
+@unittest.skipIf(fileBased.fcntl is None, 'stores are not file-locked on this platform')
+class ShardSwapTest(FileBasedStoreTestCase):
+
+    def test_readers_wait_for_a_swap(self):
+        self.store.store('modelA.ifc', make_components('a'))
+        results = []
+        reader = threading.Thread(target=lambda: results.append(read_shard(self.model_path)))
+        with self.store._swap_lock():
+            reader.start()
+            reader.join(0.2)
+            self.assertTrue(reader.is_alive())
+        reader.join(5)
+        self.assertFalse(reader.is_alive())
+        buffer, index, decode = results[0]
+        self.assertEqual(len(index), 3)
+
+    def test_reads_match_the_latest_store(self):
+        self.store.store('modelA.ifc', make_components('a'))
+        self.store.store('modelA.ifc', make_components('b', 5))
+        buffer, index, decode = read_shard(self.model_path)
+        self.assertEqual([decode(buffer[offset:offset + length])['componentGuid']
+                          for offset, length, *_ in index.values()],
+                         [f'b-c{i}' for i in range(5)])
+        self.assertEqual(read_components(self.model_path), make_components('b', 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""Unit tests for IFC2JSONSimple.from_stream
+
+Run from the server directory: python -m unittest tests.test_ingestor
+"""
+
+import io
+import os
+import sys
+import unittest
+from tempfile import SpooledTemporaryFile
+
+INGESTORS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ingestors')
+sys.path.insert(0, INGESTORS_PATH)
+
+import ifc4ingestor
+from ifc4ingestor import IFC2JSONSimple
+
+SAMPLE_IFC = os.path.join(INGESTORS_PATH, 'HelloWall-01.ifc')
+
+
+@unittest.skipIf(ifc4ingestor.ifcopenshell is None, 'ifcopenshell is not installed')
+class FromStreamTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(SAMPLE_IFC, 'rb') as f:
+            cls.data = f.read()
+        cls.expected = IFC2JSONSimple(SAMPLE_IFC).spf2Json()
+
+    def spooled(self, max_size):
+        stream = SpooledTemporaryFile(max_size=max_size, mode='w+b')
+        self.addCleanup(stream.close)
+        stream.write(self.data)
+        stream.seek(0)
+        return stream
+
+    def test_spooled_to_disk_is_opened_by_path(self):
+        stream = self.spooled(max_size=1024)
+        self.assertIsNotNone(ifc4ingestor._stream_path(stream))
+        self.assertEqual(IFC2JSONSimple.from_stream(stream).spf2Json(), self.expected)
+
+    def test_in_memory_is_parsed_from_string(self):
+        stream = self.spooled(max_size=len(self.data) + 1)
+        self.assertIsNone(ifc4ingestor._stream_path(stream))
+        self.assertFalse(stream._rolled)
+        self.assertEqual(IFC2JSONSimple.from_stream(stream).spf2Json(), self.expected)
+        self.assertEqual(IFC2JSONSimple.from_stream(io.BytesIO(self.data)).spf2Json(), self.expected)
+
+    def test_unparseable_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            IFC2JSONSimple.from_stream(io.BytesIO(b'not an IFC file \xff'))
+
+
+if __name__ == '__main__':
+    unittest.main()
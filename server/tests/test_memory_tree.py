@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""Unit tests for the fileBased MemoryTree against a temporary store
+
+Run from the server directory: python -m unittest tests.test_memory_tree
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dataStores', 'fileBased'))
+
+from fileBased import STAGING_DIR, FileBasedStore
+from memoryTree import LazyComponents, MemoryTree
+
+
+def make_components(prefix, count=3):
+    """One IfcWall entity with count components"""
+    return [{
+        'componentGuid': f'{prefix}-c{i}',
+        'entityGuid': f'{prefix}-e0',
+        'entityType': 'IfcWall',
+        'componentType': 'AttributesComponent',
+        'index': i,
+    } for i in range(count)]
+
+
+class LazyComponentsTest(unittest.TestCase):
+    """Every read path of a shard-backed model returns decoded components"""
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_path)
+        self.store = FileBasedStore(self.base_path)
+        self.components = make_components('a')
+        self.store.store('modelA.ifc', iter(self.components))
+        self.tree = MemoryTree()
+        self.tree.refresh_from_store(self.base_path)
+        self.by_guid = self.tree.models['modelA'].by_componentGuid
+        self.expected = {c['componentGuid']: c for c in self.components}
+
+    def test_shard_is_loaded_lazily(self):
+        self.assertIsInstance(self.by_guid, LazyComponents)
+        self.assertTrue(all(isinstance(v, tuple) for v in dict.values(self.by_guid)))
+
+    def test_getitem_and_get(self):
+        self.assertEqual(self.by_guid['a-c1'], self.expected['a-c1'])
+        self.assertEqual(self.by_guid.get('a-c2'), self.expected['a-c2'])
+        self.assertIsNone(self.by_guid.get('missing'))
+        self.assertEqual(self.by_guid.get('missing', 'default'), 'default')
+
+    def test_values_and_items(self):
+        self.assertEqual(sorted(self.by_guid.values(), key=lambda c: c['index']), self.components)
+        self.assertEqual(dict(self.by_guid.items()), self.expected)
+
+    def test_copies(self):
+        self.assertEqual(self.by_guid.copy(), self.expected)
+        self.assertEqual(dict(self.by_guid), self.expected)
+        self.assertEqual({**self.by_guid}, self.expected)
+
+    def test_iteration_and_membership(self):
+        self.assertEqual(sorted(self.by_guid), sorted(self.expected))
+        self.assertIn('a-c0', self.by_guid)
+        self.assertNotIn('missing', self.by_guid)
+        self.assertEqual(len(self.by_guid), 3)
+
+
+class StoreAndInsertTest(unittest.TestCase):
+    """Models stored one at a time are queryable and invalidate cached results"""
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_path)
+        self.store = FileBasedStore(self.base_path)
+        self.store.store('modelA.ifc', make_components('a'))
+        self.tree = MemoryTree()
+        self.tree.refresh_from_store(self.base_path)
+
+    def store_and_insert(self, filename, components):
+        result = self.store.store(filename, components)
+        self.tree.insert_model(result['directory'], result['path'])
+        return result
+
+    def test_inserted_model_is_queryable(self):
+        result = self.store_and_insert('modelB.ifc', iter(make_components('b', 2)))
+        self.assertEqual(result['count'], 2)
+        self.assertEqual(self.tree.get_models(), ['modelA', 'modelB'])
+        self.assertEqual(self.tree.get_entity_guids_by_model(models=['modelB']), {'modelB': ('b-e0',)})
+        self.assertEqual(self.tree.get_component_guids_by_model(entity_types=['IfcWall']),
+                         {'modelA': ('a-c0', 'a-c1', 'a-c2'), 'modelB': ('b-c0', 'b-c1')})
+        components = [c for _, c in self.tree.iter_components(['b-c1', 'a-c0'])]
+        self.assertEqual(sorted(c['componentGuid'] for c in components), ['a-c0', 'b-c1'])
+
+    def test_repeated_models_are_searched_once(self):
+        self.store_and_insert('modelB.ifc', make_components('b', 2))
+        pairs = list(self.tree.iter_components(['a-c0', 'b-c0', 'b-c1'], models=['modelB', 'modelA', 'modelB']))
+        self.assertEqual([(model, c['componentGuid']) for model, c in pairs],
+                         [('modelB', 'b-c0'), ('modelB', 'b-c1'), ('modelA', 'a-c0')])
+
+    def test_delete_and_restore_invalidate_cached_results(self):
+        version = self.tree.version
+        self.assertEqual(self.tree.get_models(), ['modelA'])
+        self.assertEqual(self.tree.get_component_guids_by_model(), {'modelA': ('a-c0', 'a-c1', 'a-c2')})
+
+        self.assertTrue(self.store.delete_model('modelA'))
+        self.tree.refresh_from_store(self.base_path)
+        self.assertGreater(self.tree.version, version)
+        self.assertEqual(self.tree.get_models(), [])
+        self.assertEqual(self.tree.get_component_guids_by_model(), {})
+
+        version = self.tree.version
+        self.store_and_insert('modelA.ifc', make_components('a2', 1))
+        self.assertGreater(self.tree.version, version)
+        self.assertEqual(self.tree.get_models(), ['modelA'])
+        self.assertEqual(self.tree.get_component_guids_by_model(), {'modelA': ('a2-c0',)})
+
+    def test_restore_within_one_mtime_tick_is_reloaded(self):
+        model_path = os.path.join(self.base_path, 'modelA')
+        mtime_ns = os.stat(model_path).st_mtime_ns
+        self.store.store('modelA.ifc', make_components('a2', 1))
+        # As on a filesystem whose timestamps are too coarse to tell the stores apart
+        os.utime(model_path, ns=(mtime_ns, mtime_ns))
+        self.tree.refresh_from_store(self.base_path)
+        self.assertEqual(self.tree.get_component_guids_by_model(), {'modelA': ('a2-c0',)})
+
+    def test_failed_store_keeps_previous_version(self):
+        def failing_conversion(prefix):
+            yield from make_components(prefix, 2)
+            raise RuntimeError('conversion failed')
+
+        for filename in ('modelA.ifc', 'modelB.ifc'):
+            with self.assertRaises(RuntimeError):
+                self.store.store(filename, failing_conversion('x'))
+
+        # No empty directory for the new model and no leftover temporary files
+        self.assertFalse(self.store.model_exists('modelB'))
+        self.assertEqual([d['name'] for d in self.store.list_directories()], ['modelA'])
+        self.assertEqual(os.listdir(os.path.join(self.base_path, STAGING_DIR)), [])
+
+        self.tree.refresh_from_store(self.base_path)
+        self.assertEqual(self.tree.get_models(), ['modelA'])
+        self.assertEqual(self.tree.get_component_guids_by_model(), {'modelA': ('a-c0', 'a-c1', 'a-c2')})
+
+
+
+class RefreshTest(unittest.TestCase):
+    """refresh_from_store re-reads only the models that changed"""
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_path)
+        self.store = FileBasedStore(self.base_path)
+        self.store.store('modelA.ifc', make_components('a'))
+        self.store.store('modelB.ifc', make_components('b'))
+        self.tree = MemoryTree()
+        self.tree.refresh_from_store(self.base_path)
+        self.loaded = dict(self.tree.models)
+
+    def test_unchanged_models_are_kept(self):
+        self.tree.refresh_from_store(self.base_path)
+        self.assertIs(self.tree.models['modelA'], self.loaded['modelA'])
+        self.assertIs(self.tree.models['modelB'], self.loaded['modelB'])
+
+    def test_stored_model_is_reloaded(self):
+        self.store.store('modelB.ifc', make_components('b2', 1))
+        self.tree.refresh_from_store(self.base_path)
+        self.assertIs(self.tree.models['modelA'], self.loaded['modelA'])
+        self.assertIsNot(self.tree.models['modelB'], self.loaded['modelB'])
+        self.assertEqual(self.tree.get_component_guids_by_model(models=['modelB']), {'modelB': ('b2-c0',)})
+
+    def test_removed_model_is_dropped(self):
+        self.store.delete_model('modelA')
+        self.tree.refresh_from_store(self.base_path)
+        self.assertEqual(self.tree.get_models(), ['modelB'])
+        self.assertIs(self.tree.models['modelB'], self.loaded['modelB'])
+
+    def test_force_reloads_every_model(self):
+        version = self.tree.version
+        self.tree.refresh_from_store(self.base_path, force=True)
+        self.assertIsNot(self.tree.models['modelA'], self.loaded['modelA'])
+        self.assertIsNot(self.tree.models['modelB'], self.loaded['modelB'])
+        self.assertGreater(self.tree.version, version)
+        self.assertEqual(self.tree.get_models(), ['modelA', 'modelB'])
+
+
+if __name__ == '__main__':
+    unittest.main()
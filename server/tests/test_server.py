@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""Unit tests for the Flask API against a temporary fileBased store
+
+Run from the server directory: python -m unittest tests.test_server
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server as srv
+from fileBased import FileBasedStore
+from tests.test_memory_tree import make_components
+
+
+class ServerTestCase(unittest.TestCase):
+    """Server whose store lives in a temporary directory"""
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_path)
+        self.server = srv.IFCProcessingServer('fileBased')
+        self.server.file_store = FileBasedStore(self.base_path)
+        self.server._refresh_memory_tree()
+        self.client = self.server.app.test_client()
+
+    def upload(self, filename, data, overwrite=False):
+        url = '/api/upload?overwrite=true' if overwrite else '/api/upload'
+        return self.client.post(url, data={'file': (io.BytesIO(data), filename)},
+                                content_type='multipart/form-data')
+
+    def upload_components(self, model_name, components, overwrite=False):
+        response = self.upload(f'{model_name}.json', srv.orjson.dumps(components), overwrite)
+        self.assertEqual(response.status_code, 200)
+
+
+class StreamEncoderTest(unittest.TestCase):
+    """Chunked JSON encoders of /api/components"""
+
+    pairs = [('modelA', {'componentGuid': 'a-c0'}), ('modelA', {'componentGuid': 'a-c1'}),
+             ('modelB', {'componentGuid': 'b-c0', 'name': 'W\u00e4nd'})]
+
+    def test_by_model(self):
+        expected = {'modelA': [{'componentGuid': 'a-c0'}, {'componentGuid': 'a-c1'}],
+                    'modelB': [{'componentGuid': 'b-c0', 'name': 'W\u00e4nd'}]}
+        self.assertEqual(srv.orjson.loads(b''.join(srv.stream_components_by_model(iter(self.pairs)))), expected)
+        chunks = list(srv.stream_components_by_model(iter(self.pairs), chunk_size=1))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(srv.orjson.loads(b''.join(chunks)), expected)
+
+    def test_by_model_empty(self):
+        self.assertEqual(b''.join(srv.stream_components_by_model(iter([]))), b'{}')
+
+    def test_ndjson(self):
+        for chunk_size in (64 * 1024, 1):
+            body = b''.join(srv.stream_components_ndjson(iter(self.pairs), chunk_size=chunk_size))
+            self.assertTrue(body.endswith(b'\n'))
+            self.assertEqual([srv.orjson.loads(line) for line in body.splitlines()],
+                             [{'model': model, 'component': component} for model, component in self.pairs])
+
+    def test_ndjson_empty(self):
+        self.assertEqual(list(srv.stream_components_ndjson(iter([]))), [])
+
+
+class ComponentsEndpointTest(ServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upload_components('modelA', make_components('a'))
+        self.upload_components('modelB', make_components('b', 2))
+
+    def test_repeated_model_is_one_key(self):
+        response = self.client.get('/api/components?models=modelB,modelA,modelB')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data()
+        self.assertEqual(body.count(b'"modelB"'), 1)
+        result = srv.orjson.loads(body)
+        self.assertEqual(list(result), ['modelB', 'modelA'])
+        self.assertEqual(sorted(c['componentGuid'] for c in result['modelB']), ['b-c0', 'b-c1'])
+
+    def test_ndjson_format(self):
+        response = self.client.get('/api/components?models=modelA&format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        records = [srv.orjson.loads(line) for line in response.get_data().splitlines()]
+        self.assertEqual(sorted((r['model'], r['component']['componentGuid']) for r in records),
+                         [('modelA', 'a-c0'), ('modelA', 'a-c1'), ('modelA', 'a-c2')])
+
+
+
+class UploadTest(ServerTestCase):
+
+    def test_unparseable_ifc_is_rejected(self):
+        response = self.upload('broken.ifc', b'not an IFC file')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.get_json())
+        self.assertEqual(self.client.get('/api/models').get_json(), [])
+
+    def test_ifc_upload_is_stored(self):
+        with open(os.path.join(os.path.dirname(srv.__file__), 'ingestors', 'HelloWall-01.ifc'), 'rb') as f:
+            response = self.upload('HelloWall.ifc', f.read())
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.get_json()['stored_count'], 0)
+        self.assertEqual(self.client.get('/api/models').get_json(), ['HelloWall'])
+
+
+class ResponseCacheTest(ServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upload_components('modelA', make_components('a'))
+
+    def cached_keys(self):
+        return list(self.server._response_cache)
+
+    def test_invalidated_when_tree_changes(self):
+        self.assertEqual(self.client.get('/api/models').get_json(), ['modelA'])
+        self.assertEqual(self.client.get('/api/models').get_json(), ['modelA'])
+        self.upload_components('modelB', make_components('b'))
+        self.assertEqual(self.client.get('/api/models').get_json(), ['modelA', 'modelB'])
+
+    def test_keyed_on_parsed_parameters(self):
+        for url in ('/api/entityTypes?models=modelA', '/api/entityTypes?models=%20modelA&_=1',
+                    '/api/entityTypes?_=2&models=modelA,'):
+            self.assertEqual(self.client.get(url).get_json(), ['IfcWall'])
+        self.assertEqual(self.cached_keys(), [('list_entity_types', ('modelA',))])
+
+    def test_bounded_by_bytes_least_recently_used_first(self):
+        urls = ['/api/models', '/api/entityTypes', '/api/componentTypes']
+        sizes = [len(self.client.get(url).get_data()) for url in urls]
+        self.server._response_cache.clear()
+        self.server._response_cache_bytes = 0
+
+        # Room for the first body and either of the others, not all three
+        max_bytes = sizes[0] + max(sizes[1], sizes[2])
+        with mock.patch.object(srv, 'RESPONSE_CACHE_MAX_BYTES', max_bytes):
+            self.client.get(urls[0])
+            self.client.get(urls[1])
+            self.client.get(urls[0])  # now the most recently used
+            self.client.get(urls[2])
+        self.assertEqual([key[0] for key in self.cached_keys()], ['list_models', 'list_component_types'])
+        self.assertLessEqual(self.server._response_cache_bytes, max_bytes)
+        self.assertEqual(self.server._response_cache_bytes,
+                         sum(len(body) for _, body in self.server._response_cache.values()))
+
+
+class WorkerSyncTest(ServerTestCase):
+
+    def test_other_worker_sees_stores_within_one_mtime_tick(self):
+        other = srv.IFCProcessingServer('fileBased')
+        other.file_store = FileBasedStore(self.base_path)
+        other._refresh_memory_tree()
+        other_client = other.app.test_client()
+        self.assertEqual(other_client.get('/api/models').get_json(), [])
+
+        mtime_ns = os.stat(self.base_path).st_mtime_ns
+        self.upload_components('modelA', make_components('a'))
+        os.utime(self.base_path, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(other_client.get('/api/models').get_json(), ['modelA'])
+
+        self.upload_components('modelA', make_components('a2', 1), overwrite=True)
+        os.utime(self.base_path, ns=(mtime_ns, mtime_ns))
+        os.utime(os.path.join(self.base_path, 'modelA'), ns=(mtime_ns, mtime_ns))
+        self.assertEqual(other_client.get('/api/componentGuids').get_json(), {'modelA': ['a2-c0']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,14 +8,13 @@ generating corresponding JSON files using the ifc4ingestor.py module.
 
 import os
 import sys
-import json
 from pathlib import Path
 
-# Add server directory to Python path to import the ingestor
+# Add the ingestors directory to Python path to import the ingestor
 server_dir = Path(__file__).parent.parent.parent
-sys.path.insert(0, str(server_dir))
+sys.path.insert(0, str(server_dir / 'ingestors'))
 
-from ingestors.ifc4ingestor import IFC2JSONSimple
+from ifc4ingestor import IFC2JSONSimple, writeJsonArray
 
 
 def find_ifc_files(root_dir):
@@ -63,19 +62,15 @@ def process_ifc_file(ifc_path, output_path=None, compact=False, empty_properties
         # Create converter instance
         converter = IFC2JSONSimple(
             str(ifc_path),
-            COMPACT=compact,
             EMPTY_PROPERTIES=empty_properties,
             modelName=model_name
         )
         
-        # Convert to JSON
-        json_objects = converter.spf2Json()
+        # Convert and write one entity at a time, no full list in memory
+        with open(output_path, 'wb') as f:
+            count = writeJsonArray(converter.iterSpf2Json(), f, compact=compact)
         
-        # Write to output file
-        with open(output_path, 'w') as f:
-            json.dump(json_objects, f, indent=None if compact else 2, default=str)
-        
-        print(f"  ✓ Generated: {output_path} ({len(json_objects)} entities)")
+        print(f"  ✓ Generated: {output_path} ({count} entities)")
         return True
         
     except Exception as e:
@@ -0,0 +1,14 @@
+"""WSGI entry point for production serving with Gunicorn
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The data store backend is taken from the BACKEND environment variable
+(default: fileBased).
+"""
+
+import os
+
+from server import create_app
+
+app = create_app(data_store_type=os.environ.get('BACKEND', 'fileBased'))